@@ -0,0 +1,15 @@
+# cart/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
+from .services import get_cart_summary
+
+
+def cart_summary(request):
+    """
+    {{ cart_summary.count }} / {{ cart_summary.total }} в любом шаблоне.
+    Ленивый объект: кэш (и при промахе БД) читается, только если шаблон обращается к сводке.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'cart_summary': SimpleLazyObject(lambda: get_cart_summary(user))}
@@ -0,0 +1,21 @@
+# cart/middleware.py
+from .services import ANON_CART_COOKIE, invalidate_cart_summary, load_anonymous_cart, merge_items
+
+
+class AnonymousCartMiddleware:
+    """
+    После входа (или регистрации) переносит корзину из подписанной cookie в CartItem
+    одним bulk upsert и удаляет cookie. Запросы без cookie корзины не затрагивает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if ANON_CART_COOKIE in request.COOKIES and request.user.is_authenticated:
+            merged = merge_items(request.user, load_anonymous_cart(request))
+            if merged:
+                invalidate_cart_summary(request.user.pk)
+            response.delete_cookie(ANON_CART_COOKIE)
+        return response
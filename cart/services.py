@@ -0,0 +1,160 @@
+# cart/services.py
+"""
+Изменение корзины одним запросом к БД.
+Проверка остатка квоты входит в сам INSERT/UPDATE, поэтому между проверкой и записью
+нет окна для гонки, а добавление в корзину — один round trip.
+
+Сводка корзины (число билетов и сумма) для шапки сайта хранится в кэше и сбрасывается
+при каждом изменении корзины.
+
+Корзина анонимного посетителя живёт в подписанной cookie ("<event_tariff_id>:<qty>,...")
+и переносится в CartItem при входе (cart.middleware.AnonymousCartMiddleware).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import (
+    Case, DecimalField, DurationField, ExpressionWrapper, F, IntegerField, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Now
+
+from events.models import Event, EventTariff
+from .models import CartItem
+
+ANON_CART_COOKIE = 'cart'
+ANON_CART_SALT = 'cart.anonymous'
+
+# время окончания события в SQL — то же, что Event.ends_at
+EVENT_ENDS_AT = F('event__starts_at') + ExpressionWrapper(
+    Coalesce('event__duration_minutes', 0, output_field=IntegerField()) * Value(timedelta(minutes=1)),
+    output_field=DurationField(),
+)
+
+
+def _upsert_items(user, quantities: dict) -> list:
+    """
+    INSERT ... SELECT ... ON CONFLICT (user, event_tariff) DO UPDATE для набора {event_tariff_id: qty}.
+    Строка вставляется/увеличивается, только если тариф и событие доступны для покупки
+    и количество в корзине не превысит остаток квоты. Возвращает [(event_tariff_id, quantity)] изменённых строк.
+    """
+    if len(quantities) == 1:
+        qty_expr = Value(next(iter(quantities.values())))
+    else:
+        qty_expr = Case(*[When(pk=pk, then=Value(q)) for pk, q in quantities.items()], output_field=IntegerField())
+    source = (EventTariff.objects
+              .order_by()
+              .annotate(event_ends_at=EVENT_ENDS_AT, qty=qty_expr)
+              .filter(pk__in=list(quantities), is_active=True,
+                      event__is_active=True, event__status=Event.Status.PUBLISHED,
+                      event_ends_at__gte=Now(),
+                      available_quantity__gte=F('sales_count') + F('qty'))
+              .values_list(Value(user.pk), 'event_id', 'pk', 'qty', Now()))
+    select_sql, params = source.query.sql_with_params()
+
+    qn = connection.ops.quote_name
+    cart = qn(CartItem._meta.db_table)
+    tariffs = qn(EventTariff._meta.db_table)
+    sql = (
+        f"INSERT INTO {cart} ({qn('user_id')}, {qn('event_id')}, {qn('event_tariff_id')}, "
+        f"{qn('quantity')}, {qn('added_at')}) {select_sql} "
+        f"ON CONFLICT ({qn('user_id')}, {qn('event_tariff_id')}) DO UPDATE "
+        f"SET {qn('quantity')} = {cart}.{qn('quantity')} + EXCLUDED.{qn('quantity')} "
+        f"WHERE {cart}.{qn('quantity')} + EXCLUDED.{qn('quantity')} <= ("
+        f"SELECT {qn('available_quantity')} - {qn('sales_count')} FROM {tariffs} "
+        f"WHERE {qn('id')} = EXCLUDED.{qn('event_tariff_id')}) "
+        f"RETURNING {qn('event_tariff_id')}, {qn('quantity')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def add_item(user, event_tariff_id: int, qty: int):
+    """
+    Добавляет qty билетов тарифа в корзину одним запросом (см. _upsert_items).
+    Возвращает новое количество в корзине или None, если добавить нельзя.
+    """
+    rows = _upsert_items(user, {event_tariff_id: qty})
+    return rows[0][1] if rows else None
+
+
+def merge_items(user, quantities: dict) -> int:
+    """
+    Переносит анонимную корзину {event_tariff_id: qty} в CartItem одним upsert.
+    Недоступные тарифы и позиции сверх остатка квоты пропускаются. Возвращает число перенесённых позиций.
+    """
+    if not quantities:
+        return 0
+    return len(_upsert_items(user, quantities))
+
+
+def set_item_quantity(user, item_id: int, qty: int) -> bool:
+    """
+    Устанавливает количество позиции корзины одним UPDATE с проверкой остатка квоты.
+    Возвращает False, если позиции нет или билетов недостаточно.
+    """
+    return bool(CartItem.objects
+                .filter(pk=item_id, user=user,
+                        event_tariff__available_quantity__gte=F('event_tariff__sales_count') + qty)
+                .update(quantity=qty))
+
+
+def _summary_key(user_id) -> str:
+    return f'cart:summary:{user_id}'
+
+
+def summarize_items(items) -> dict:
+    """Сводка по уже загруженным позициям корзины (с event_tariff)."""
+    return {
+        'count': sum(ci.quantity for ci in items),
+        'total': sum((ci.subtotal for ci in items), Decimal('0.00')),
+    }
+
+
+def store_cart_summary(user, items) -> dict:
+    """Считает сводку по загруженным позициям и кладёт её в кэш (вьюхи корзины и так читают строки)."""
+    summary = summarize_items(items)
+    cache.set(_summary_key(user.pk), summary, settings.CART_SUMMARY_TTL)
+    return summary
+
+
+def get_cart_summary(user) -> dict:
+    """Сводка {'count', 'total'} из кэша; при промахе — один агрегирующий запрос."""
+    key = _summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        agg = CartItem.objects.filter(user=user).aggregate(
+            count=Sum('quantity'),
+            total=Sum(F('quantity') * F('event_tariff__price'), output_field=DecimalField()),
+        )
+        summary = {'count': agg['count'] or 0, 'total': agg['total'] or Decimal('0.00')}
+        cache.set(key, summary, settings.CART_SUMMARY_TTL)
+    return summary
+
+
+def invalidate_cart_summary(user_id):
+    cache.delete(_summary_key(user_id))
+
+
+def load_anonymous_cart(request) -> dict:
+    """{event_tariff_id: qty} из подписанной cookie; повреждённая или чужая подпись — пустая корзина."""
+    raw = request.get_signed_cookie(ANON_CART_COOKIE, default='', salt=ANON_CART_SALT,
+                                    max_age=settings.ANON_CART_COOKIE_AGE)
+    cart = {}
+    for part in raw.split(','):
+        et_id, _, qty = part.partition(':')
+        if et_id.isdigit() and qty.isdigit() and int(qty) > 0:
+            cart[int(et_id)] = int(qty)
+    return cart
+
+
+def save_anonymous_cart(response, cart: dict):
+    if not cart:
+        response.delete_cookie(ANON_CART_COOKIE)
+        return
+    value = ','.join(f'{et_id}:{qty}' for et_id, qty in cart.items())
+    response.set_signed_cookie(ANON_CART_COOKIE, value, salt=ANON_CART_SALT,
+                               max_age=settings.ANON_CART_COOKIE_AGE, httponly=True, samesite='Lax')
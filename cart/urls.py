@@ -10,5 +10,6 @@ urlpatterns = [
     path('remove/<int:item_id>/', views.cart_remove, name='remove'),
     path('checkout/', views.checkout, name='checkout'),
     path('checkout/success/', views.checkout_success, name='checkout_success'),
+    path('checkout/status/<int:order_id>/', views.checkout_status, name='checkout_status'),  # long-poll статуса оплаты
     path('checkout/cancel/<int:order_id>/', views.checkout_cancel, name='checkout_cancel'),
 ]
@@ -1,23 +1,49 @@
 # cart/views.py
-from decimal import Decimal
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import models
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
+from core.ratelimit import limited_redirect, rate_limit
 from events.models import EventTariff
 from .models import CartItem
+from .services import (
+    add_item, invalidate_cart_summary, load_anonymous_cart, save_anonymous_cart, set_item_quantity,
+    store_cart_summary, summarize_items,
+)
 from tickets.models import Order
-from tickets.services import create_order_from_cart, finalize_order_payment
-from payments.services import get_yk_payment # ДОБАВЛЕНО: для проверки статуса оплаты
-import json
+from tickets.services import create_order_from_cart
+from payments.services import resolve_order_payment
 
-@login_required
+@rate_limit('cart_add', on_limit=limited_redirect('cart:view'))
 def add_to_cart(request, event_tariff_id):
     if request.method != 'POST':
         return redirect('events:list')
 
+    try:
+        qty = int(request.POST.get('quantity', '1') or 1)
+    except ValueError:
+        qty = 1
+    if qty < 1:
+        qty = 1
+
+    if not request.user.is_authenticated:
+        return _add_to_anonymous_cart(request, event_tariff_id, qty)
+
+    # Обычный путь — один запрос: upsert с проверкой доступности и квоты (cart.services.add_item)
+    if add_item(request.user, event_tariff_id, qty) is not None:
+        invalidate_cart_summary(request.user.pk)
+        messages.success(request, "Билет(ы) добавлены в корзину.")
+        return redirect('cart:view')
+
+    # Отказ: выясняем причину для сообщения пользователю
     et = get_object_or_404(
         EventTariff.objects.select_related('event', 'tariff'),
         pk=event_tariff_id,
@@ -26,69 +52,75 @@ def add_to_cart(request, event_tariff_id):
     # событие должно быть опубликовано и активно
     if not (et.event.is_active and et.event.status == et.event.Status.PUBLISHED):
         messages.error(request, "Нельзя добавить билеты для неопубликованного мероприятия.")
-        return redirect('events:detail', et.event.slug)
-
-    # --- ДОБАВЛЕННЫЙ БЛОК ---
-    if et.event.is_past:
+    elif et.event.is_past:
         messages.error(request, "Событие уже прошло. Покупка недоступна.")
-        return redirect('events:detail', et.event.slug)
-    # -------------------------
+    else:
+        existing = CartItem.objects.filter(user=request.user, event_tariff=et).aggregate(s=models.Sum('quantity'))['s'] or 0
+        messages.error(request, f"Недостаточно билетов. Доступно: {max(et.remaining - existing, 0)}.")
+    return redirect('events:detail', et.event.slug)
 
-    try:
-        qty = int(request.POST.get('quantity', '1') or 1)
-    except ValueError:
-        qty = 1
-    if qty < 1:
-        qty = 1
 
-    remaining = (et.available_quantity or 0) - (et.sales_count or 0)
-    existing = CartItem.objects.filter(user=request.user, event_tariff=et).aggregate(s=models.Sum('quantity'))['s'] or 0
-    if qty + existing > remaining:
-        messages.error(request, f"Недостаточно билетов. Доступно: {max(remaining - existing, 0)}.")
-        return redirect('events:detail', et.event.slug)
-
-    item, created = CartItem.objects.get_or_create(
-        user=request.user,
-        event=et.event,
-        event_tariff=et,
-        defaults={'quantity': qty}
+def _add_to_anonymous_cart(request, event_tariff_id, qty):
+    """Корзина гостя: только чтение тарифа из БД, позиции — в подписанной cookie."""
+    et = get_object_or_404(
+        EventTariff.objects.select_related('event'),
+        pk=event_tariff_id,
+        is_active=True
     )
-    if not created:
-        item.quantity += qty
-        item.save(update_fields=['quantity'])
-
-    messages.success(request, "Билет(ы) добавлены в корзину.")
-    return redirect('cart:view')
+    cart = load_anonymous_cart(request)
+    in_cart = cart.get(et.pk, 0)
+    if not (et.event.is_active and et.event.status == et.event.Status.PUBLISHED):
+        messages.error(request, "Нельзя добавить билеты для неопубликованного мероприятия.")
+    elif et.event.is_past:
+        messages.error(request, "Событие уже прошло. Покупка недоступна.")
+    elif qty + in_cart > et.remaining:
+        messages.error(request, f"Недостаточно билетов. Доступно: {max(et.remaining - in_cart, 0)}.")
+    elif not in_cart and len(cart) >= settings.ANON_CART_MAX_ITEMS:
+        messages.error(request, "В корзине слишком много позиций. Войдите, чтобы продолжить покупки.")
+    else:
+        cart[et.pk] = in_cart + qty
+        messages.success(request, "Билет(ы) добавлены в корзину. Войдите, чтобы оформить заказ.")
+        response = redirect('cart:view')
+        save_anonymous_cart(response, cart)
+        return response
+    return redirect('events:detail', et.event.slug)
 
 
-@login_required
 def cart_view(request):
-    items = CartItem.objects.select_related('event', 'event_tariff', 'event_tariff__tariff').filter(user=request.user)
-    total = sum((ci.event_tariff.price * ci.quantity for ci in items), Decimal('0.00'))
-    return render(request, 'cart/cart.html', {'items': items, 'total': total})
+    if not request.user.is_authenticated:
+        # корзина гостя: позиции из cookie, тарифы — одним запросом; ничего не сохраняем
+        cart = load_anonymous_cart(request)
+        tariffs = EventTariff.objects.select_related('event', 'tariff').filter(pk__in=list(cart))
+        items = [CartItem(event=et.event, event_tariff=et, quantity=cart[et.pk]) for et in tariffs]
+        total = summarize_items(items)['total']
+        return render(request, 'cart/cart.html', {'items': items, 'total': total, 'anonymous': True})
+
+    items = list(CartItem.objects.select_related('event', 'event_tariff', 'event_tariff__tariff').filter(user=request.user))
+    # строки всё равно загружены — заодно обновляем сводку корзины в кэше
+    summary = store_cart_summary(request.user, items)
+    return render(request, 'cart/cart.html', {'items': items, 'total': summary['total']})
 
 
 @login_required
 def cart_update(request, item_id):
-    item = get_object_or_404(CartItem, pk=item_id, user=request.user)
     try:
         qty = int(request.POST.get('quantity', '1') or 1)
     except ValueError:
         qty = 1
 
     if qty <= 0:
-        item.delete()
+        get_object_or_404(CartItem, pk=item_id, user=request.user).delete()
+        invalidate_cart_summary(request.user.pk)
         messages.info(request, "Позиция удалена.")
         return redirect('cart:view')
 
-    et = item.event_tariff
-    remaining = (et.available_quantity or 0) - (et.sales_count or 0)
-    if qty > remaining:
-        messages.error(request, f"Доступно только {remaining} шт.")
+    # один UPDATE с проверкой остатка квоты (cart.services.set_item_quantity)
+    if not set_item_quantity(request.user, item_id, qty):
+        item = get_object_or_404(CartItem.objects.select_related('event_tariff'), pk=item_id, user=request.user)
+        messages.error(request, f"Доступно только {item.event_tariff.remaining} шт.")
         return redirect('cart:view')
 
-    item.quantity = qty
-    item.save(update_fields=['quantity'])
+    invalidate_cart_summary(request.user.pk)
     messages.success(request, "Количество обновлено.")
     return redirect('cart:view')
 
@@ -97,13 +129,14 @@ def cart_update(request, item_id):
 def cart_remove(request, item_id):
     item = get_object_or_404(CartItem, pk=item_id, user=request.user)
     item.delete()
+    invalidate_cart_summary(request.user.pk)
     messages.info(request, "Позиция удалена из корзины.")
     return redirect('cart:view')
 
 
 @login_required
 def checkout(request):
-    items = CartItem.objects.select_related('event', 'event_tariff').filter(user=request.user)
+    items = list(CartItem.objects.select_related('event', 'event_tariff').filter(user=request.user))
     if not items:
         messages.info(request, "Корзина пуста.")
         return redirect('cart:view')
@@ -117,72 +150,59 @@ def checkout(request):
         # показываем "эмулятор оплаты"
         return render(request, 'cart/checkout_pay.html', {'order': order})
 
-    total = sum((ci.event_tariff.price * ci.quantity for ci in items), Decimal('0.00'))
-    return render(request, 'cart/checkout.html', {'items': items, 'total': total})
+    summary = store_cart_summary(request.user, items)
+    return render(request, 'cart/checkout.html', {'items': items, 'total': summary['total']})
 
 
 @login_required
 def checkout_success(request):
-    from payments.models import PaymentTransaction  # локальный импорт, чтобы избежать циклов
     paid = False
     order = None
+    confirmation_url = None
 
     pid = request.GET.get('pid') or request.session.pop('yk_payment_id', None)
     oid = request.GET.get('order') or request.session.get('yk_order_id')
 
-    # 1) Если знаем заказ — проверим его статус
+    # Статус берём из заказа / PaymentTransaction (её обновляет вебхук),
+    # к ЮKassa обращаемся не чаще раза в YOO_KASSA_STATUS_CACHE_TTL (см. resolve_order_payment)
     if oid:
         order = Order.objects.select_related('user').filter(id=oid, user=request.user).first()
-        if order and order.status == Order.Status.PAID:
-            paid = True
-
-    # 2) Если не оплачено, но есть payment_id — спросим ЮKassa
-    if not paid and pid and order:
-        try:
-            p = get_yk_payment(pid)
-            if getattr(p, 'status', None) == 'succeeded':
-                if order.status != Order.Status.PAID:
-                    finalize_order_payment(order, order.user)
-                paid = True
-        except Exception:
-            pass
-
-    # 3) Если всё ещё не оплачено — попробуем найти последний платёж по этому заказу в нашей таблице
-    confirmation_url = None
-    if not paid and oid:
-        last_tx = PaymentTransaction.objects.filter(order_id=oid).order_by('-created_at').first()
-        if last_tx:
-            try:
-                p = get_yk_payment(last_tx.payment_id)
-                if getattr(p, 'status', None) == 'succeeded' and order:
-                    if order.status != Order.Status.PAID:
-                        finalize_order_payment(order, order.user)
-                    paid = True
-            except Exception:
-                pass
-
-            # на случай, если всё ещё не оплачено — дадим ссылку "вернуться к оплате"
-            if not paid:
-                # --- ЗАМЕНЕННЫЙ БЛОК ДЛЯ БЕЗОПАСНОГО ИЗВЛЕЧЕНИЯ URL ---
-                confirmation_url = None
-                if last_tx:
-                    try:
-                        # Десериализация, если payload является строкой, иначе используем как есть
-                        payload_data = json.loads(last_tx.payload) if isinstance(last_tx.payload, str) else last_tx.payload
-                        # Безопасное извлечение confirmation_url
-                        confirmation_url = payload_data.get('confirmation', {}).get('confirmation_url')
-                    except Exception:
-                        # Ловим ошибки десериализации (например, невалидный JSON)
-                        pass
-                # -------------------------------------------------------------
+    if order:
+        result = resolve_order_payment(order, payment_id=pid)
+        paid = result['paid']
+        confirmation_url = result['confirmation_url']
 
     return render(request, "cart/success.html", {
         "paid": paid,
         "order": order,
         "confirmation_url": confirmation_url,
+        "longpoll": bool(order) and not paid and order.status == Order.Status.PENDING,
     })
 
 
+@login_required
+async def checkout_status(request, order_id):
+    """
+    Long-poll: ждёт (до ?wait= секунд) финализации заказа и отвечает JSON {'paid', 'status'}.
+    Асинхронная вьюха — под ASGI ожидание не занимает воркер; БД проверяется раз в
+    CHECKOUT_LONGPOLL_INTERVAL секунд, провайдер — через кэш статусов.
+    """
+    user = await request.auser()
+    try:
+        wait = min(max(float(request.GET.get('wait') or 0), 0), settings.CHECKOUT_LONGPOLL_MAX_WAIT)
+    except ValueError:
+        wait = 0
+    deadline = time.monotonic() + wait
+
+    while True:
+        order = await Order.objects.filter(id=order_id, user=user).afirst()
+        if order is None:
+            return JsonResponse({"error": "Заказ не найден"}, status=404)
+        result = await sync_to_async(resolve_order_payment)(order)
+        if result['paid'] or result['status'] != Order.Status.PENDING or time.monotonic() >= deadline:
+            return JsonResponse({"paid": result['paid'], "status": result['status']})
+        await asyncio.sleep(min(settings.CHECKOUT_LONGPOLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+
 
 @login_required
 def checkout_cancel(request, order_id):
@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'users',
     'events.apps.EventsConfig', # подключаем через apps.py для сигналов
@@ -40,6 +41,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'cart.middleware.AnonymousCartMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -55,6 +57,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'cart.context_processors.cart_summary',
             ],
         },
     },
@@ -77,6 +80,14 @@ DATABASES = {
     }
 }
 
+# Кэш (для нескольких воркеров укажите общий backend, например Redis или Memcached)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'cult-default'),
+    }
+}
+
 
 
 
@@ -136,6 +147,14 @@ LOGGING = {
     'loggers': {
         # наш явный логгер для писем
         'mail': {'handlers': ['console'], 'level': 'INFO'},
+        # обработка платежей и вебхуков
+        'payments': {'handlers': ['console'], 'level': 'INFO'},
+        # замеры JSON API дашборда (DEBUG — время ответа и попадание в кэш)
+        'dashboard': {'handlers': ['console'], 'level': os.getenv('DASHBOARD_LOG_LEVEL', 'INFO')},
+        # мероприятия: пакетная AI-генерация описаний
+        'events': {'handlers': ['console'], 'level': 'INFO'},
+        # производные изображений (core.images)
+        'core.images': {'handlers': ['console'], 'level': 'INFO'},
     },
 }
 
@@ -172,10 +191,86 @@ YOO_KASSA_IS_TEST = os.getenv('YOO_KASSA_IS_TEST', 'true').lower() == 'true'
 YOO_KASSA_RETURN_URL = os.getenv('YOO_KASSA_RETURN_URL', SITE_URL + '/checkout/success/')
 YOO_KASSA_WEBHOOK_URL = os.getenv('YOO_KASSA_WEBHOOK_URL', SITE_URL + '/payments/yookassa/webhook/')
 
+# HTTP-клиент ЮKassa (payments/gateway.py); для нагрузочных тестов и CI — локальная заглушка:
+# python manage.py yookassa_stub и YOO_KASSA_API_URL=http://127.0.0.1:8010/v3
+YOO_KASSA_API_URL = os.getenv('YOO_KASSA_API_URL', 'https://api.yookassa.ru/v3')
+YOO_KASSA_CONNECT_TIMEOUT = float(os.getenv('YOO_KASSA_CONNECT_TIMEOUT', '3'))
+YOO_KASSA_READ_TIMEOUT = float(os.getenv('YOO_KASSA_READ_TIMEOUT', '10'))
+YOO_KASSA_MAX_RETRIES = int(os.getenv('YOO_KASSA_MAX_RETRIES', '2'))
+YOO_KASSA_RETRY_BACKOFF = float(os.getenv('YOO_KASSA_RETRY_BACKOFF', '0.3'))
+YOO_KASSA_BREAKER_THRESHOLD = int(os.getenv('YOO_KASSA_BREAKER_THRESHOLD', '5'))
+YOO_KASSA_BREAKER_RESET = float(os.getenv('YOO_KASSA_BREAKER_RESET', '30'))
+YOO_KASSA_POOL_SIZE = int(os.getenv('YOO_KASSA_POOL_SIZE', '10'))
+# сколько секунд кэшируется ответ провайдера о статусе платежа
+YOO_KASSA_STATUS_CACHE_TTL = int(os.getenv('YOO_KASSA_STATUS_CACHE_TTL', '5'))
+# через сколько минут неоплаченный заказ отменяется (python manage.py expire_pending_orders)
+ORDER_PENDING_TTL_MINUTES = int(os.getenv('ORDER_PENDING_TTL_MINUTES', '1440'))
+# long-poll страницы успешной оплаты: максимум ожидания и шаг проверки, сек
+CHECKOUT_LONGPOLL_MAX_WAIT = float(os.getenv('CHECKOUT_LONGPOLL_MAX_WAIT', '25'))
+CHECKOUT_LONGPOLL_INTERVAL = float(os.getenv('CHECKOUT_LONGPOLL_INTERVAL', '2'))
+
 # для локальной разработки можно пропускать auth вебхука
 YOO_KASSA_SKIP_WEBHOOK_AUTH = os.getenv('YOO_KASSA_SKIP_WEBHOOK_AUTH', 'true').lower() == 'true'
+# сколько раз воркер process_webhook_inbox пробует обработать уведомление
+YOO_KASSA_WEBHOOK_MAX_ATTEMPTS = int(os.getenv('YOO_KASSA_WEBHOOK_MAX_ATTEMPTS', '5'))
+# через сколько дней сырой payload PaymentTransaction уходит в сжатый архив (archive_payment_payloads)
+PAYMENT_PAYLOAD_HOT_DAYS = int(os.getenv('PAYMENT_PAYLOAD_HOT_DAYS', '30'))
 
 
 YANDEX_GPT_API_KEY = os.getenv('YANDEX_GPT_API_KEY', '')
 YANDEX_GPT_FOLDER_ID = os.getenv('YANDEX_GPT_FOLDER_ID', '')
 YANDEX_GPT_TIMEOUT = int(os.getenv('YANDEX_GPT_TIMEOUT', '25'))
+YANDEX_GPT_API_URL = os.getenv('YANDEX_GPT_API_URL', 'https://llm.api.cloud.yandex.net/foundationModels/v1/completion')
+YANDEX_GPT_MODEL = os.getenv('YANDEX_GPT_MODEL', 'yandexgpt/latest')
+# кэш сгенерированных описаний: TTL, сек, и максимум записей в кэше процесса (LRU)
+YANDEX_GPT_CACHE_TTL = int(os.getenv('YANDEX_GPT_CACHE_TTL', '3600'))
+YANDEX_GPT_CACHE_MAX_ENTRIES = int(os.getenv('YANDEX_GPT_CACHE_MAX_ENTRIES', '256'))
+# пакетная генерация описаний: число параллельных запросов к провайдеру
+YANDEX_GPT_BATCH_WORKERS = int(os.getenv('YANDEX_GPT_BATCH_WORKERS', '4'))
+
+# Дашборд: снимок статистики считается свежим DASHBOARD_CACHE_TTL секунд,
+# устаревший снимок хранится DASHBOARD_CACHE_STALE_TTL и отдаётся, пока идёт пересчёт
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '60'))
+DASHBOARD_CACHE_STALE_TTL = int(os.getenv('DASHBOARD_CACHE_STALE_TTL', '3600'))
+DASHBOARD_CACHE_LOCK_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_LOCK_TIMEOUT', '30'))
+# максимум точек во временном ряду (например, 2000 дней или ~83 дня по часам)
+DASHBOARD_TS_MAX_POINTS = int(os.getenv('DASHBOARD_TS_MAX_POINTS', '2000'))
+
+# сводка корзины в шапке (число билетов, сумма): сколько секунд живёт в кэше
+CART_SUMMARY_TTL = int(os.getenv('CART_SUMMARY_TTL', '3600'))
+# корзина анонимного посетителя (подписанная cookie): срок жизни, сек, и максимум позиций
+ANON_CART_COOKIE_AGE = int(os.getenv('ANON_CART_COOKIE_AGE', str(30 * 24 * 3600)))
+ANON_CART_MAX_ITEMS = int(os.getenv('ANON_CART_MAX_ITEMS', '20'))
+
+# массовый импорт мероприятий организатором через сайт: максимум строк в одном файле и размер файла, байт
+# (JSON-массив читается в память целиком, до проверки числа строк)
+EVENT_IMPORT_MAX_ROWS = int(os.getenv('EVENT_IMPORT_MAX_ROWS', '5000'))
+EVENT_IMPORT_MAX_FILE_SIZE = int(os.getenv('EVENT_IMPORT_MAX_FILE_SIZE', str(10 * 1024 * 1024)))
+
+# кабинет организатора: событий на странице (курсорная пагинация)
+MY_EVENTS_PER_PAGE = int(os.getenv('MY_EVENTS_PER_PAGE', '25'))
+
+# серии повторяющихся показов: максимум показов, создаваемых одним правилом
+EVENT_SERIES_MAX_OCCURRENCES = int(os.getenv('EVENT_SERIES_MAX_OCCURRENCES', '200'))
+
+# производные изображений (core.images): ширины в px, качество WebP/JPEG.
+# IMAGE_PROCESSING_MODE: sync — сразу после сохранения загрузки, worker — командой process_images --loop
+IMAGE_DERIVATIVE_WIDTHS = [int(w) for w in os.getenv('IMAGE_DERIVATIVE_WIDTHS', '320,640,1280').split(',')]
+IMAGE_WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', '80'))
+IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', '82'))
+IMAGE_PROCESSING_MODE = os.getenv('IMAGE_PROCESSING_MODE', 'sync')
+
+# админка: для списков без фильтров больше стольких строк число записей берётся из статистики PostgreSQL
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', '10000'))
+
+# ограничение частоты запросов (core.ratelimit): "N/период", период s|m|h
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# доверять X-Forwarded-For (только за своим прокси)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+RATE_LIMITS = {
+    'ai_generate': os.getenv('RATE_LIMIT_AI_GENERATE', '6/m'),
+    'ai_batch': os.getenv('RATE_LIMIT_AI_BATCH', '60/m'),  # пакетная генерация, общий на все процессы
+    'cart_add': os.getenv('RATE_LIMIT_CART_ADD', '30/m'),
+    'payment_start': os.getenv('RATE_LIMIT_PAYMENT_START', '10/m'),
+    'ticket_scan': os.getenv('RATE_LIMIT_TICKET_SCAN', '120/m'),
+}
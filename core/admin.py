@@ -0,0 +1,53 @@
+# core/admin.py
+"""
+Общие части админки для больших таблиц (билеты, заказы, платежи, события).
+
+Список изменений в админке делает COUNT(*) по всей таблице на каждую страницу; на миллионах строк
+это секунды. Для списка без фильтров число строк берётся из статистики планировщика
+(pg_class.reltuples) — точность ±несколько процентов для пагинатора не важна. С фильтром или
+поиском выполняется обычный COUNT, он идёт по индексам условий.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_row_count(model, using='default'):
+    """Оценка числа строк таблицы по статистике PostgreSQL или None (другая СУБД, нет статистики)."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                       [connection.ops.quote_name(model._meta.db_table)])
+        row = cursor.fetchone()
+    # -1 — таблица ещё ни разу не анализировалась
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор, который для queryset без WHERE берёт оценку из pg_class, если таблица больше
+    ADMIN_ESTIMATED_COUNT_THRESHOLD строк. Для небольших таблиц и отфильтрованных списков — точный COUNT.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        query = getattr(qs, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimated_row_count(qs.model, qs.db)
+            if estimate is not None and estimate > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class LargeTableAdminMixin:
+    """
+    ModelAdmin для больших таблиц: оценочный счётчик страниц и без второго COUNT
+    по всей таблице («N всего») при фильтрации/поиске.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
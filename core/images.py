@@ -0,0 +1,184 @@
+# core/images.py
+"""
+Производные изображений (афиши событий, фото из заявок на правку, аватары).
+
+Оригинал загрузки не меняется. Рядом, в derivatives/<путь оригинала>.w<ширина>.<webp|jpg>, сохраняются
+уменьшенные копии фиксированных ширин (IMAGE_DERIVATIVE_WIDTHS, но не шире оригинала) в WebP и JPEG:
+с учётом ориентации из EXIF, без EXIF/ICC и прочих метаданных. Размеры оригинала записываются в модель;
+по ним же шаблонный хелпер строит srcset, не обращаясь к хранилищу.
+
+Обработка запускается после сохранения модели (IMAGE_PROCESSING_MODE='sync', после коммита) или
+воркером/командой process_images (IMAGE_PROCESSING_MODE='worker'): там файлы обрабатываются пулом процессов,
+а в БД пишет только основной процесс.
+"""
+import io
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps
+
+logger = logging.getLogger('core.images')
+
+# (модель, поле файла, поле ширины, поле высоты)
+IMAGE_FIELDS = (
+    ('events.Event', 'image', 'image_width', 'image_height'),
+    ('events.EventEditRequest', 'new_image', 'new_image_width', 'new_image_height'),
+    ('users.User', 'avatar', 'avatar_width', 'avatar_height'),
+)
+FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+DERIVATIVES_DIR = 'derivatives'
+
+
+def derivative_widths(width: int) -> list:
+    """Ширины производных для оригинала данной ширины: фиксированные, но не больше оригинала."""
+    return sorted({min(w, width) for w in settings.IMAGE_DERIVATIVE_WIDTHS})
+
+
+def derivative_name(name: str, width: int, ext: str) -> str:
+    # расширение оригинала остаётся в имени: poster.jpg и poster.png не должны делить производные
+    return f'{DERIVATIVES_DIR}/{name}.w{width}.{ext}'
+
+
+def _encode(image, ext: str) -> bytes:
+    buf = io.BytesIO()
+    if ext == 'webp':
+        image.save(buf, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY, method=4)
+    else:
+        if image.mode != 'RGB':
+            # JPEG без альфа-канала: прозрачность — на белый фон
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+            image = background
+        image.save(buf, 'JPEG', quality=settings.IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def _write(storage, name: str, data: bytes):
+    # фиксированное имя: при повторной обработке перезаписываем, а не получаем name_abc123.webp
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(data))
+
+
+def process_image(name: str, storage=None):
+    """Создаёт производные для файла из хранилища. Возвращает (ширина, высота) оригинала после поворота."""
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    width, height = image.size
+    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    for w in derivative_widths(width):
+        h = max(round(height * w / width), 1)
+        resized = image if w == width else image.resize((w, h), Image.Resampling.LANCZOS)
+        for ext in FORMATS:
+            _write(storage, derivative_name(name, w, ext), _encode(resized, ext))
+    return width, height
+
+
+def process_file(name: str):
+    """Для пула процессов: только файлы, без БД. (имя, ширина, высота, ошибка)."""
+    try:
+        width, height = process_image(name)
+        return name, width, height, None
+    except Exception as e:  # битый файл не должен останавливать пакет
+        return name, None, None, f'{type(e).__name__}: {e}'
+
+
+def record_result(model, pk, field: str, width_field: str, height_field: str, name: str, width, height):
+    """Записывает размеры, если за время обработки картинку не заменили. 0x0 — файл не обработать."""
+    return model.objects.filter(pk=pk, **{field: name}).update(
+        **{width_field: width or 0, height_field: height or 0}
+    )
+
+
+def process_and_record(model, pk, field, width_field, height_field, name):
+    name, width, height, error = process_file(name)
+    if error:
+        logger.warning("Не удалось обработать %s: %s", name, error)
+    record_result(model, pk, field, width_field, height_field, name, width, height)
+
+
+# --- автоматическая обработка при загрузке ---
+
+def _specs_for(sender):
+    # прокси-модели (PendingEvent) сохраняют те же таблицы
+    model = sender._meta.concrete_model
+    return [spec for spec in _REGISTRY if spec[0] is model]
+
+
+def _on_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or not _specs_for(sender):
+        return
+    changed = []
+    for _, field, width_field, height_field in _specs_for(sender):
+        f = getattr(instance, field)
+        # новая загрузка (файл ещё не в хранилище) или картинку убрали — старые размеры недействительны
+        if not f or not getattr(f, '_committed', True):
+            setattr(instance, width_field, None)
+            setattr(instance, height_field, None)
+            if f:
+                changed.append(field)
+    instance._images_changed = changed
+
+
+def _on_post_save(sender, instance, **kwargs):
+    changed = getattr(instance, '_images_changed', None)
+    if not changed:
+        return
+    instance._images_changed = []
+    for model, field, width_field, height_field in _specs_for(sender):
+        if field not in changed:
+            continue
+        name = getattr(instance, field).name
+        # save(update_fields=...) мог не записать сброс размеров
+        model.objects.filter(pk=instance.pk).update(**{width_field: None, height_field: None})
+        if settings.IMAGE_PROCESSING_MODE == 'sync':
+            transaction.on_commit(lambda m=model, f=field, w=width_field, h=height_field, n=name: process_and_record(
+                m, instance.pk, f, w, h, n))
+
+
+_REGISTRY = []
+
+
+def connect_signals():
+    """Подключает обработку загрузок для моделей из IMAGE_FIELDS (вызывается из CoreConfig.ready)."""
+    if _REGISTRY:
+        return
+    for label, field, width_field, height_field in IMAGE_FIELDS:
+        _REGISTRY.append((apps.get_model(label), field, width_field, height_field))
+    # без sender: сохранения прокси-моделей приходят со своим классом
+    pre_save.connect(_on_pre_save, dispatch_uid='core.images.pre_save')
+    post_save.connect(_on_post_save, dispatch_uid='core.images.post_save')
+
+
+# --- для шаблонов ---
+
+def image_dimensions(fieldfile):
+    """(ширина, высота) оригинала из модели или None, если картинка ещё не обработана."""
+    instance = getattr(fieldfile, 'instance', None)
+    if not fieldfile or instance is None:
+        return None
+    for model, field, width_field, height_field in _REGISTRY:
+        if isinstance(instance, model) and field == fieldfile.field.name:
+            width, height = getattr(instance, width_field), getattr(instance, height_field)
+            return (width, height) if width and height else None
+    return None
+
+
+def image_srcset(fieldfile, ext: str = 'webp') -> str:
+    """srcset производных ("url 320w, url 640w") или пустая строка, если производных ещё нет."""
+    dims = image_dimensions(fieldfile)
+    if dims is None:
+        return ''
+    storage = fieldfile.storage
+    return ', '.join(f'{storage.url(derivative_name(fieldfile.name, w, ext))} {w}w'
+                     for w in derivative_widths(dims[0]))
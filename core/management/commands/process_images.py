@@ -0,0 +1,83 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from core.images import IMAGE_FIELDS, process_file, record_result
+
+
+def _init_worker():
+    # при spawn (не fork) дочерний процесс стартует без настроенного Django
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт производные изображений (WebP/JPEG фиксированных ширин, без метаданных) и записывает размеры: "
+        "бэкфилл существующих файлов или воркер для IMAGE_PROCESSING_MODE=worker. "
+        "Картинки обрабатываются пулом процессов, в БД пишет только основной процесс."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='+', choices=[spec[0] for spec in IMAGE_FIELDS],
+                            help='Только эти модели (по умолчанию все из core.images.IMAGE_FIELDS)')
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать производные и для уже обработанных картинок')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--loop', action='store_true', help='Работать воркером: проходы по расписанию')
+        parser.add_argument('--interval', type=int, default=30, help='Пауза между проходами воркера, сек')
+
+    def handle(self, *args, **opts):
+        specs = [spec for spec in IMAGE_FIELDS if not opts['models'] or spec[0] in opts['models']]
+        # соединения с БД не должны попасть в дочерние процессы (fork)
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=opts['workers'], initializer=_init_worker) as pool:
+            while True:
+                for spec in specs:
+                    self._run(pool, spec, opts)
+                if not opts['loop']:
+                    break
+                # --all имеет смысл только для первого прохода
+                opts['all'] = False
+                time.sleep(opts['interval'])
+
+    def _run(self, pool, spec, opts):
+        label, field, width_field, height_field = spec
+        model = apps.get_model(label)
+        qs = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        if not opts['all']:
+            qs = qs.filter(**{f'{width_field}__isnull': True})
+
+        started = time.perf_counter()
+        stats = {'processed': 0, 'failed': 0}
+        last_pk = 0
+        while True:
+            # keyset по pk: обработанные строки выпадают из выборки, OFFSET не нужен
+            batch = list(qs.filter(pk__gt=last_pk).order_by('pk').values_list('pk', field)[:opts['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            # один файл может стоять в нескольких строках (афиша события из одобренной заявки)
+            names = list(dict.fromkeys(name for _, name in batch))
+            results = {name: (width, height, error) for name, width, height, error in pool.map(process_file, names)}
+            with transaction.atomic():
+                for pk, name in batch:
+                    width, height, error = results[name]
+                    if error:
+                        stats['failed'] += 1
+                        self.stderr.write(f"{label} #{pk} {name}: {error}")
+                    else:
+                        stats['processed'] += 1
+                    record_result(model, pk, field, width_field, height_field, name, width, height)
+
+        if stats['processed'] or stats['failed'] or not opts['loop']:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{label}.{field}: обработано {stats['processed']}, ошибок {stats['failed']} "
+                              f"за {elapsed:.1f} с")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.ratelimit import prune_buckets
+
+
+class Command(BaseCommand):
+    help = "Удаляет устаревшие вёдра ограничения частоты (RateLimitBucket)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-hours', type=int, default=24, help='Сколько часов ведро не использовалось')
+
+    def handle(self, *args, **opts):
+        deleted = prune_buckets(opts['idle_hours'] * 3600)
+        self.stdout.write(f"Удалено вёдер: {deleted}")
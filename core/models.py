@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class RateLimitBucket(models.Model):
+    """
+    Состояние token bucket одного ключа ограничения частоты (см. core.ratelimit).
+    Таблица общая для всех процессов; строка обновляется одним атомарным upsert.
+    """
+    key = models.CharField(max_length=200, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField()  # unix time последнего списания
+
+    def __str__(self):
+        return f'{self.key}: {self.tokens:.2f}'
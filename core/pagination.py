@@ -0,0 +1,59 @@
+# core/pagination.py
+"""
+Курсорная (keyset) пагинация: следующая страница выбирается условием
+"(поле, id) меньше последней строки" по индексу, без OFFSET и без COUNT(*).
+Курсор — подписанные значения ключа последней строки, поэтому подделать его нельзя.
+"""
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SALT = 'core.pagination.cursor'
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor, is_first):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _encode(value, pk):
+    return signing.dumps([value.isoformat() if hasattr(value, 'isoformat') else value, pk], salt=CURSOR_SALT)
+
+
+def _decode(cursor):
+    try:
+        value, pk = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return (parse_datetime(value) or value) if isinstance(value, str) else value, pk
+
+
+def paginate_by_cursor(qs, cursor: str = None, per_page: int = 20, field: str = 'created_at') -> CursorPage:
+    """
+    Страница qs по убыванию (field, pk) начиная после cursor. Нужен индекс по (..., field) в условиях qs.
+    Битый или чужой курсор — первая страница.
+    """
+    key = _decode(cursor) if cursor else None
+    qs = qs.order_by(f'-{field}', '-pk')
+    if key is not None:
+        value, pk = key
+        qs = qs.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+    rows = list(qs[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = _encode(getattr(last, field), last.pk)
+    return CursorPage(rows, next_cursor, is_first=key is None)
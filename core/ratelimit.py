@@ -0,0 +1,136 @@
+# core/ratelimit.py
+"""
+Ограничение частоты запросов: token bucket, общий для всех воркеров (таблица RateLimitBucket).
+
+Лимит задаётся в settings.RATE_LIMITS строкой "N/период" (s, m, h): ведро на N токенов,
+которое за период полностью восполняется. Каждый запрос списывает токен; пополнение
+и списание — один INSERT ... ON CONFLICT DO UPDATE, поэтому гонок между процессами нет.
+"""
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import redirect
+
+from .models import RateLimitBucket
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+LIMIT_MESSAGE = "Слишком много запросов. Попробуйте позже."
+
+
+def parse_rate(rate: str):
+    """'10/m' -> (capacity=10, refill=10/60 токенов в секунду)."""
+    count, _, period = rate.partition('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period.strip().lower()[:1]]
+
+
+def consume(key: str, capacity: int, refill_per_sec: float, cost: int = 1):
+    """
+    Списывает cost токенов из ведра key. Возвращает (allowed, retry_after_seconds).
+    Пополнение (прошедшее время * refill, не выше capacity) и списание — в одном запросе.
+    """
+    qn = connection.ops.quote_name
+    table = qn(RateLimitBucket._meta.db_table)
+    tokens, updated_at = qn('tokens'), qn('updated_at')
+    refilled = (f"{table}.{tokens} + (EXCLUDED.{updated_at} - {table}.{updated_at}) * %(rate)s")
+    level = f"(CASE WHEN {refilled} > %(cap)s THEN %(cap)s ELSE {refilled} END)"
+    sql = (
+        f"INSERT INTO {table} ({qn('key')}, {tokens}, {updated_at}) "
+        f"VALUES (%(key)s, %(cap)s - %(cost)s, %(now)s) "
+        f"ON CONFLICT ({qn('key')}) DO UPDATE SET {tokens} = {level} - %(cost)s, {updated_at} = EXCLUDED.{updated_at} "
+        f"WHERE {level} >= %(cost)s "
+        f"RETURNING {tokens}"
+    )
+    params = {'key': key, 'cap': float(capacity), 'cost': float(cost), 'rate': refill_per_sec, 'now': time.time()}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        allowed = cursor.fetchone() is not None
+    return allowed, (0 if allowed else math.ceil(cost / refill_per_sec))
+
+
+def client_ip(request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '') or 'unknown'
+
+
+def _bucket_key(request, scope: str, key: str) -> str:
+    if key == 'endpoint':
+        return f'{scope}:all'
+    if key == 'user' and request.user.is_authenticated:
+        return f'{scope}:u:{request.user.pk}'
+    return f'{scope}:ip:{client_ip(request)}'
+
+
+def _default_limited_response(request, retry_after: int):
+    if request.content_type == 'application/json' or 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse({"error": LIMIT_MESSAGE, "retry_after": retry_after}, status=429)
+    return HttpResponse(LIMIT_MESSAGE, status=429, content_type='text/plain; charset=utf-8')
+
+
+def limited_redirect(to: str = None):
+    """on_limit для HTML-форм: сообщение и редирект на to (по умолчанию — на ту же страницу)."""
+    def on_limit(request, retry_after):
+        messages.error(request, f"{LIMIT_MESSAGE} Повторите через {retry_after} с.")
+        return redirect(to or request.path)
+    return on_limit
+
+
+def _check(request, scope: str, key: str, methods=None):
+    if not settings.RATE_LIMIT_ENABLED or (methods and request.method not in methods):
+        return True, 0
+    capacity, refill = parse_rate(settings.RATE_LIMITS[scope])
+    return consume(_bucket_key(request, scope, key), capacity, refill)
+
+
+def rate_limit(scope: str, key: str = 'user', on_limit=None, methods=None):
+    """
+    Декоратор вьюхи: лимит settings.RATE_LIMITS[scope] на ключ
+      'user'     — пользователь (аноним — по IP),
+      'ip'       — IP клиента,
+      'endpoint' — общий на всех.
+    methods — считать только эти HTTP-методы (по умолчанию все).
+    При превышении — on_limit(request, retry_after) или 429 (JSON для API) с заголовком Retry-After.
+    Работает и с async-вьюхами.
+    """
+    make_response = on_limit or _default_limited_response
+
+    def decorator(view):
+        def limited(request, retry_after):
+            response = make_response(request, retry_after)
+            if response.status_code == 429:
+                response['Retry-After'] = str(retry_after)
+            return response
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                allowed, retry_after = await sync_to_async(_check)(request, scope, key, methods)
+                if not allowed:
+                    return limited(request, retry_after)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            allowed, retry_after = _check(request, scope, key, methods)
+            if not allowed:
+                return limited(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def prune_buckets(idle_seconds: int) -> int:
+    """Удаляет вёдра, не тронутые idle_seconds (за это время любое ведро уже полное)."""
+    deleted, _ = RateLimitBucket.objects.filter(updated_at__lt=time.time() - idle_seconds).delete()
+    return deleted
@@ -0,0 +1,44 @@
+"""
+Адаптивные изображения из производных core.images:
+
+    {% load images %}
+    {% picture event.image alt=event.title sizes="300px" style="max-width:300px;" %}
+    <img srcset="{{ event.image|srcset:'jpg' }}" ...>
+
+Пока производных нет (картинка не обработана), выводится оригинал.
+"""
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.images import derivative_name, derivative_widths, image_dimensions, image_srcset
+
+register = template.Library()
+
+
+@register.filter
+def srcset(fieldfile, ext='webp'):
+    return image_srcset(fieldfile, ext)
+
+
+@register.simple_tag
+def picture(fieldfile, alt='', sizes='100vw', **attrs):
+    """
+    <picture> с WebP и JPEG-производными, width/height оригинала (без скачка вёрстки) и ленивой загрузкой.
+    Прочие именованные аргументы (class, style, ...) переносятся в <img>.
+    """
+    if not fieldfile:
+        return ''
+    extra = format_html_join('', ' {}="{}"', ((k.replace('_', '-'), v) for k, v in attrs.items()))
+    dims = image_dimensions(fieldfile)
+    if dims is None:
+        return format_html('<img src="{}" alt="{}" loading="lazy"{}>', fieldfile.url, alt, extra)
+    width, height = dims
+    fallback = fieldfile.storage.url(derivative_name(fieldfile.name, derivative_widths(width)[-1], 'jpg'))
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" loading="lazy" decoding="async"{}>'
+        '</picture>',
+        image_srcset(fieldfile, 'webp'), sizes,
+        fallback, image_srcset(fieldfile, 'jpg'), sizes, width, height, alt, extra,
+    )
@@ -0,0 +1,246 @@
+# dashboard/services.py
+import datetime
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum, F, DecimalField, ExpressionWrapper
+from django.db.models.functions import TruncDate, TruncHour
+from django.urls import reverse
+from django.utils import timezone
+
+from events.models import Event, EventTariff
+from tickets.models import OrderItem, Ticket
+
+ADMIN_SCOPE = 'admin'
+
+
+# --- области видимости и версии кэша ---
+def is_admin_user(user) -> bool:
+    return user.is_staff or user.is_superuser
+
+
+def scope_for_user(user):
+    """Возвращает organizer_id для расчётов (None — администратор видит всё)."""
+    return None if is_admin_user(user) else user.id
+
+
+def scope_key(organizer_id) -> str:
+    return ADMIN_SCOPE if organizer_id is None else f'org:{organizer_id}'
+
+
+def _version_key(scope: str) -> str:
+    return f'dashboard:ver:{scope}'
+
+
+def get_scope_version(scope: str) -> int:
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # начальное значение от времени: после вытеснения ключа версия не совпадёт со старым снимком
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_dashboard_versions(organizer_ids) -> None:
+    """
+    Инвалидирует снимки дашборда: админский и переданных организаторов.
+    Старые снимки не удаляются — они отдаются как stale, пока один запрос пересчитывает данные.
+    """
+    scopes = {ADMIN_SCOPE} | {scope_key(oid) for oid in organizer_ids if oid}
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+# --- расчёт статистики ---
+LINE_TOTAL = ExpressionWrapper(
+    F('unit_price') * F('quantity'),
+    output_field=DecimalField(max_digits=14, decimal_places=2)
+)
+REMAINING_EXPR = ExpressionWrapper(
+    F('available_quantity') - F('sales_count'),
+    output_field=DecimalField(max_digits=12, decimal_places=0)
+)
+
+GRANULARITY_DAY = 'day'
+GRANULARITY_HOUR = 'hour'
+
+
+def _events_qs(organizer_id):
+    qs = Event.objects.all()
+    if organizer_id is not None:
+        qs = qs.filter(organizer_id=organizer_id)
+    return qs
+
+
+def _paid_items_qs(organizer_id):
+    # Продажи: берём только оплаченные позиции заказа
+    qs = OrderItem.objects.filter(order__paid_at__isnull=False)
+    if organizer_id is not None:
+        qs = qs.filter(event__organizer_id=organizer_id)
+    return qs
+
+
+def build_cards(organizer_id=None) -> dict:
+    """Карточки метрик: выручка, продано, остаток, check-in."""
+    items_qs = _paid_items_qs(organizer_id)
+    agg = items_qs.aggregate(revenue=Sum(LINE_TOTAL), sold=Sum('quantity'))
+
+    # --- Остатки по тарифам ---
+    tariff_qs = EventTariff.objects.filter(event__in=_events_qs(organizer_id))
+    remaining_total = tariff_qs.aggregate(rem=Sum(REMAINING_EXPR))['rem'] or 0
+    try:
+        remaining_total = int(remaining_total)
+    except Exception:
+        remaining_total = 0
+
+    # --- Посещаемость (помеченные билеты) ---
+    tickets_used_qs = Ticket.objects.filter(is_used=True)
+    if organizer_id is not None:
+        tickets_used_qs = tickets_used_qs.filter(event__organizer_id=organizer_id)
+
+    return {
+        'revenue_total': agg['revenue'] or Decimal('0'),
+        'sold_total': agg['sold'] or 0,
+        'remaining_total': remaining_total,
+        'checkins_total': tickets_used_qs.count(),
+    }
+
+
+def build_timeseries(organizer_id, date_from: datetime.date, date_to: datetime.date,
+                     granularity: str = GRANULARITY_DAY) -> dict:
+    """Временной ряд продаж за [date_from; date_to] по дням или по часам (локальное время)."""
+    trunc = TruncHour if granularity == GRANULARITY_HOUR else TruncDate
+    ts_qs = (_paid_items_qs(organizer_id)
+        .filter(order__paid_at__date__gte=date_from, order__paid_at__date__lte=date_to)
+        .annotate(d=trunc('order__paid_at'))
+        .values('d')
+        .annotate(revenue=Sum(LINE_TOTAL), sold=Sum('quantity'))
+        .order_by('d'))
+
+    if granularity == GRANULARITY_HOUR:
+        label_fmt = '%d.%m %H:00'
+        by_label = {timezone.localtime(row['d']).strftime(label_fmt): row for row in ts_qs}
+        step = datetime.timedelta(hours=1)
+        cur = timezone.make_aware(datetime.datetime.combine(date_from, datetime.time.min))
+        stop = timezone.make_aware(datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min))
+    else:
+        label_fmt = '%d.%m' if date_from.year == date_to.year else '%d.%m.%Y'
+        by_label = {row['d'].strftime(label_fmt): row for row in ts_qs}
+        step = datetime.timedelta(days=1)
+        cur, stop = date_from, date_to + step
+
+    labels, revenue, sold = [], [], []
+    while cur < stop:
+        label = (timezone.localtime(cur) if granularity == GRANULARITY_HOUR else cur).strftime(label_fmt)
+        row = by_label.get(label)
+        labels.append(label)
+        revenue.append(float(row['revenue']) if row and row['revenue'] else 0.0)
+        sold.append(int(row['sold']) if row and row['sold'] else 0)
+        cur += step
+
+    return {'granularity': granularity, 'labels': labels, 'revenue': revenue, 'sold': sold}
+
+
+def build_categories(organizer_id=None) -> dict:
+    """Топ-8 категорий по выручке."""
+    cat_qs = (_paid_items_qs(organizer_id)
+              .values('event__category__name')
+              .annotate(revenue=Sum(LINE_TOTAL))
+              .order_by('-revenue')[:8])
+    return {
+        'labels': [row['event__category__name'] or 'Без категории' for row in cat_qs],
+        'values': [float(row['revenue'] or 0) for row in cat_qs],
+    }
+
+
+def build_top_events(organizer_id=None) -> list:
+    """Топ-10 событий по выручке."""
+    rows = (_paid_items_qs(organizer_id)
+            .values('event__id', 'event__title', 'event__slug')
+            .annotate(revenue=Sum(LINE_TOTAL), sold=Sum('quantity'))
+            .order_by('-revenue')[:10])
+    return [{
+        'id': row['event__id'],
+        'title': row['event__title'],
+        'url': reverse('events:detail', args=[row['event__slug']]),
+        'sold': int(row['sold'] or 0),
+        'revenue': row['revenue'] or Decimal('0'),
+    } for row in rows]
+
+
+def build_events_summary(organizer_id=None, limit: int = 50) -> list:
+    """Сводка по последним событиям: продано / осталось."""
+    events = list(_events_qs(organizer_id)
+                  .select_related('category')
+                  .order_by('-starts_at')[:limit])
+    ids = [e.id for e in events]
+    sold_per_event = dict(
+        _paid_items_qs(organizer_id).filter(event_id__in=ids)
+        .values('event_id').annotate(sold=Sum('quantity')).values_list('event_id', 'sold')
+    )
+    remaining_per_event = dict(
+        EventTariff.objects.filter(event_id__in=ids)
+        .values('event_id').annotate(rem=Sum(REMAINING_EXPR)).values_list('event_id', 'rem')
+    )
+
+    summary = []
+    for e in events:
+        rem = int(remaining_per_event.get(e.id, 0) or 0)
+        summary.append({
+            'id': e.id,
+            'title': e.title,
+            'url': reverse('events:detail', args=[e.slug]),
+            'category': e.category.name if e.category else '',
+            'starts_at': timezone.localtime(e.starts_at).strftime('%d.%m.%Y %H:%M'),
+            'location': e.location,
+            'sold': int(sold_per_event.get(e.id, 0) or 0),
+            'remaining': max(rem, 0),
+        })
+    return summary
+
+
+# --- кэш снимков (stale-while-revalidate) ---
+def get_cached_section(organizer_id, name: str, builder):
+    """
+    Возвращает результат builder() из кэша области видимости.
+    Если версия области изменилась или снимок устарел, пересчитывает только
+    один запрос (держит блокировку), остальные получают предыдущий снимок.
+    Второе значение — был ли ответ взят из кэша.
+    """
+    scope = scope_key(organizer_id)
+    version = get_scope_version(scope)
+    snap_key = f'dashboard:{name}:{scope}'
+    lock_key = f'dashboard:lock:{name}:{scope}'
+
+    snap = cache.get(snap_key)
+    now_ts = time.time()
+    if snap and snap['version'] == version and now_ts - snap['built_at'] < settings.DASHBOARD_CACHE_TTL:
+        return snap['data'], True
+
+    got_lock = cache.add(lock_key, 1, timeout=settings.DASHBOARD_CACHE_LOCK_TIMEOUT)
+    if snap and not got_lock:
+        # кто-то уже пересчитывает — отдаём прошлый снимок
+        return snap['data'], True
+
+    try:
+        data = builder()
+        cache.set(snap_key, {'version': version, 'built_at': now_ts, 'data': data},
+                  timeout=settings.DASHBOARD_CACHE_STALE_TTL)
+    finally:
+        if got_lock:
+            cache.delete(lock_key)
+    return data, False
+
+
+def get_dashboard_context(user) -> dict:
+    """Контекст первой отрисовки: только карточки, графики и таблицы грузятся через API."""
+    organizer_id = scope_for_user(user)
+    cards, _ = get_cached_section(organizer_id, 'cards', lambda: build_cards(organizer_id))
+    return {'is_admin': organizer_id is None, 'cards': cards}
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from tickets.models import Order, OrderItem, Ticket
+from .services import bump_dashboard_versions
+
+
+# Заказ оплачен — сбрасываем снимки админа и организаторов событий из заказа
+@receiver(post_save, sender=Order)
+def on_order_paid(sender, instance, created, update_fields=None, **kwargs):
+    if instance.status != Order.Status.PAID:
+        return
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    organizer_ids = list(
+        OrderItem.objects.filter(order=instance)
+        .values_list('event__organizer_id', flat=True)
+        .distinct()
+    )
+    transaction.on_commit(lambda: bump_dashboard_versions(organizer_ids))
+
+
+# Отметка о проходе (check-in) или её снятие
+@receiver(post_save, sender=Ticket)
+def on_ticket_checkin(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return  # новые билеты учитываются через оплату заказа
+    if update_fields is not None and 'is_used' not in update_fields:
+        return
+    organizer_id = instance.event.organizer_id
+    transaction.on_commit(lambda: bump_dashboard_versions([organizer_id]))
@@ -5,4 +5,10 @@ app_name = "dashboard"
 
 urlpatterns = [
     path("", views.dashboard_index, name="index"),
-]
\ No newline at end of file
+
+    # JSON для графиков и таблиц (страница грузит их параллельно после отрисовки)
+    path("api/timeseries/", views.api_timeseries, name="api_timeseries"),
+    path("api/categories/", views.api_categories, name="api_categories"),
+    path("api/top-events/", views.api_top_events, name="api_top_events"),
+    path("api/events-summary/", views.api_events_summary, name="api_events_summary"),
+]
@@ -1,141 +1,126 @@
 import datetime
-from decimal import Decimal
+import logging
+import time
+from functools import wraps
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Sum, F, DecimalField, ExpressionWrapper
-from django.db.models.functions import TruncDate
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-from events.models import Event, EventTariff
-from tickets.models import OrderItem, Ticket
+from .services import (
+    GRANULARITY_DAY, GRANULARITY_HOUR,
+    get_dashboard_context, get_cached_section, scope_for_user,
+    build_timeseries, build_categories, build_top_events, build_events_summary,
+)
+
+logger = logging.getLogger('dashboard')
 
 
 @login_required
-#    Главная страница дашборда. Показывает статистику по продажам, билетам и событиям.
+#    Главная страница дашборда. Сразу отдаёт только карточки (из кэша, см. services.py),
+#    графики и таблицы страница догружает параллельно через JSON API ниже.
 def dashboard_index(request):
-    user = request.user
-    is_admin = user.is_staff or user.is_superuser
-
-    # --- Список событий в области видимости пользователя ---
-    events_filter = Q()
-    if not is_admin:
-        events_filter &= Q(organizer=user)
-
-    events_qs = (Event.objects
-                 .filter(events_filter)
-                 .select_related('category', 'organizer'))
-
-    # --- Продажи (берём только оплаченные позиции заказа) ---
-    items_qs = OrderItem.objects.filter(order__paid_at__isnull=False)
-    if not is_admin:
-        items_qs = items_qs.filter(event__organizer=user)
-
-    line_total = ExpressionWrapper(
-        F('unit_price') * F('quantity'),
-        output_field=DecimalField(max_digits=14, decimal_places=2)
-    )
+    ctx = get_dashboard_context(request.user)
+    return render(request, "dashboard/index.html", ctx)
 
-    agg = items_qs.aggregate(
-        revenue=Sum(line_total),
-        sold=Sum('quantity')
-    )
-    revenue_total = agg['revenue'] or Decimal('0')
-    sold_total = agg['sold'] or 0
-
-    # --- Остатки по тарифам ---
-    tariff_qs = EventTariff.objects.filter(event__in=events_qs)
-    remaining_expr = ExpressionWrapper(
-        F('available_quantity') - F('sales_count'),
-        output_field=DecimalField(max_digits=12, decimal_places=0)
-    )
-    remaining_total = tariff_qs.aggregate(rem=Sum(remaining_expr))['rem'] or 0
-    try:
-        remaining_total = int(remaining_total)
-    except Exception:
-        remaining_total = 0
-
-    # --- Посещаемость (помеченные билеты) ---
-    tickets_used_qs = Ticket.objects.filter(is_used=True)
-    if not is_admin:
-        tickets_used_qs = tickets_used_qs.filter(event__organizer=user)
-    checkins_total = tickets_used_qs.count()
-
-    # --- Временной ряд (последние 30 дней) ---
-    from django.utils import timezone
+
+# --- JSON API ---
+def _dashboard_api(name):
+    """
+    Обёртка для JSON-эндпоинтов дашборда: авторизация, замер времени
+    (заголовок Server-Timing + лог) и отметка попадания в кэш.
+    Вьюха возвращает (payload, cached) или готовый JsonResponse (ошибка).
+    """
+    def decorator(view):
+        @login_required
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            started = time.perf_counter()
+            result = view(request, *args, **kwargs)
+            if isinstance(result, JsonResponse):
+                return result
+            payload, cached = result
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            response = JsonResponse(payload, safe=False)
+            response['Server-Timing'] = f'{name};dur={elapsed_ms:.1f};desc="{"hit" if cached else "miss"}"'
+            logger.debug("dashboard api %s user=%s cache=%s %.1fms",
+                         name, request.user.id, "hit" if cached else "miss", elapsed_ms)
+            return response
+        return wrapper
+    return decorator
+
+
+def _parse_range(request):
+    """
+    Период для временного ряда: ?date_from=&date_to= (YYYY-MM-DD) или ?days=N (по умолчанию 30).
+    Возвращает (date_from, date_to) или строку с ошибкой.
+    """
     today = timezone.localdate()
-    start_date = today - datetime.timedelta(days=29)
-
-    ts_qs = (items_qs
-        .filter(order__paid_at__date__gte=start_date, order__paid_at__date__lte=today)
-        .annotate(d=TruncDate('order__paid_at'))
-        .values('d')
-        .annotate(revenue=Sum(line_total), sold=Sum('quantity'))
-        .order_by('d'))
-
-    by_date = {row['d']: row for row in ts_qs}
-    ts_labels = []
-    ts_revenue = []
-    ts_sold = []
-    for i in range(30):
-        d = start_date + datetime.timedelta(days=i)
-        ts_labels.append(d.strftime('%d.%m'))
-        row = by_date.get(d)
-        ts_revenue.append(float(row['revenue']) if row and row['revenue'] else 0.0)
-        ts_sold.append(int(row['sold']) if row and row['sold'] else 0)
-
-    # --- Топ категорий по выручке ---
-    cat_qs = (items_qs
-              .values('event__category__name')
-              .annotate(revenue=Sum(line_total))
-              .order_by('-revenue')[:8])
-    cat_labels = [row['event__category__name'] or 'Без категории' for row in cat_qs]
-    cat_values = [float(row['revenue'] or 0) for row in cat_qs]
-
-    # --- Топ событий по выручке ---
-    top_events = (items_qs
-                  .values('event__id', 'event__title', 'event__slug')
-                  .annotate(revenue=Sum(line_total), sold=Sum('quantity'))
-                  .order_by('-revenue')[:10])
-
-    # --- Сводка по событиям (продано/остаток) ---
-    sold_per_event = dict(
-        items_qs.values('event__id').annotate(sold=Sum('quantity')).values_list('event__id', 'sold')
-    )
-    remaining_per_event = dict(
-        tariff_qs.values('event_id').annotate(rem=Sum(remaining_expr)).values_list('event_id', 'rem')
+    try:
+        # несуществующая дата (2024-02-30) — ValueError из parse_date
+        date_to = parse_date(request.GET.get('date_to') or '') or today
+        date_from = parse_date(request.GET.get('date_from') or '')
+    except ValueError:
+        return "Некорректная дата, ожидается YYYY-MM-DD"
+    if date_from is None:
+        try:
+            days = int(request.GET.get('days') or 30)
+        except ValueError:
+            return "Параметр days должен быть числом"
+        if days < 1:
+            return "Параметр days должен быть положительным"
+        # огромный days переполнил бы timedelta; больше точек, чем дней, в ряду всё равно не будет
+        if days > settings.DASHBOARD_TS_MAX_POINTS:
+            return "Слишком большой период для выбранной детализации"
+        try:
+            date_from = date_to - datetime.timedelta(days=days - 1)
+        except OverflowError:
+            return "Слишком большой период для выбранной детализации"
+    if date_from > date_to:
+        return "date_from позже date_to"
+    return date_from, date_to
+
+
+@_dashboard_api('timeseries')
+def api_timeseries(request):
+    granularity = request.GET.get('granularity') or GRANULARITY_DAY
+    if granularity not in (GRANULARITY_DAY, GRANULARITY_HOUR):
+        return JsonResponse({"error": "granularity: day или hour"}, status=400)
+
+    period = _parse_range(request)
+    if isinstance(period, str):
+        return JsonResponse({"error": period}, status=400)
+    date_from, date_to = period
+
+    points = (date_to - date_from).days + 1
+    if granularity == GRANULARITY_HOUR:
+        points *= 24
+    if points > settings.DASHBOARD_TS_MAX_POINTS:
+        return JsonResponse({"error": "Слишком большой период для выбранной детализации"}, status=400)
+
+    organizer_id = scope_for_user(request.user)
+    name = f'ts:{granularity}:{date_from.isoformat()}:{date_to.isoformat()}'
+    return get_cached_section(
+        organizer_id, name, lambda: build_timeseries(organizer_id, date_from, date_to, granularity)
     )
 
-    events_summary = []
-    for e in events_qs.order_by('-starts_at')[:50]:
-        sold = int(sold_per_event.get(e.id, 0) or 0)
-        rem = int(remaining_per_event.get(e.id, 0) or 0)
-        if rem < 0:
-            rem = 0
-        events_summary.append({
-            'id': e.id,
-            'title': e.title,
-            'slug': e.slug,
-            'category': e.category.name if e.category else '',
-            'starts_at': e.starts_at,
-            'location': e.location,
-            'sold': sold,
-            'remaining': rem,
-        })
-
-    ctx = {
-        'is_admin': is_admin,
-        'cards': {
-            'revenue_total': revenue_total,
-            'sold_total': sold_total,
-            'remaining_total': remaining_total,
-            'checkins_total': checkins_total,
-        },
-        'ts_labels': ts_labels,
-        'ts_revenue': ts_revenue,
-        'ts_sold': ts_sold,
-        'cat_labels': cat_labels,
-        'cat_values': cat_values,
-        'top_events': top_events,
-        'events_summary': events_summary,
-    }
-    return render(request, "dashboard/index.html", ctx)
+
+@_dashboard_api('categories')
+def api_categories(request):
+    organizer_id = scope_for_user(request.user)
+    return get_cached_section(organizer_id, 'categories', lambda: build_categories(organizer_id))
+
+
+@_dashboard_api('top_events')
+def api_top_events(request):
+    organizer_id = scope_for_user(request.user)
+    return get_cached_section(organizer_id, 'top_events', lambda: build_top_events(organizer_id))
+
+
+@_dashboard_api('events_summary')
+def api_events_summary(request):
+    organizer_id = scope_for_user(request.user)
+    return get_cached_section(organizer_id, 'events_summary', lambda: build_events_summary(organizer_id))
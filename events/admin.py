@@ -1,9 +1,12 @@
 # events/admin.py
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.admin.helpers import ActionForm
+from django.db.models import Exists, F, OuterRef
 from django.utils import timezone
-from .models import Category, Tariff, Event, EventTariff, EventEditRequest, PendingEvent
+from core.admin import LargeTableAdminMixin
+from .models import Category, Tariff, Event, EventTariff, EventEditRequest, EventSeries, PendingEvent
+from .services.ai import generate_suggested_descriptions
 
 
 @admin.register(Category)
@@ -18,12 +21,10 @@ class TariffAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 # --- проверка на активные тарифы ---
-def event_has_active_tariff(event: Event) -> bool:
-    for et in event.event_tariffs.filter(is_active=True):
-        rem = max((et.available_quantity or 0) - (et.sales_count or 0), 0)
-        if rem > 0:
-            return True
-    return False
+# есть активный тариф с остатком — одним подзапросом для всего queryset
+HAS_AVAILABLE_TARIFF = Exists(
+    EventTariff.objects.filter(event=OuterRef('pk'), is_active=True, available_quantity__gt=F('sales_count'))
+)
 
 # --- форма действий ---
 class EventActionForm(ActionForm):
@@ -36,30 +37,23 @@ class EventActionForm(ActionForm):
 # --- actions ---
 @admin.action(description="Отправить на модерацию")
 def mark_pending(modeladmin, request, queryset):
-    updated = 0
-    for ev in queryset:
-        if ev.status in (Event.Status.DRAFT, Event.Status.REJECTED):
-            ev.status = Event.Status.PENDING
-            ev.moderation_comment = ""
-            ev.moderated_by = None
-            ev.save(update_fields=["status", "moderation_comment", "moderated_by"])
-            updated += 1
+    updated = queryset.filter(status__in=(Event.Status.DRAFT, Event.Status.REJECTED)).update(
+        status=Event.Status.PENDING,
+        moderation_comment="",
+        moderated_by=None,
+    )
     modeladmin.message_user(request, f"На модерацию отправлено: {updated}")
 
 @admin.action(description="Опубликовать (одобрить)")
 def publish_events(modeladmin, request, queryset):
-    approved = 0
-    skipped = 0
-    for ev in queryset:
-        if not event_has_active_tariff(ev):
-            skipped += 1
-            continue
-        ev.status = Event.Status.PUBLISHED
-        ev.published_at = timezone.now()
-        ev.moderated_by = request.user
-        ev.moderation_comment = ""
-        ev.save(update_fields=["status", "published_at", "moderated_by", "moderation_comment"])
-        approved += 1
+    total = queryset.count()
+    approved = queryset.filter(HAS_AVAILABLE_TARIFF).update(
+        status=Event.Status.PUBLISHED,
+        published_at=timezone.now(),
+        moderated_by=request.user,
+        moderation_comment="",
+    )
+    skipped = total - approved
     msg = f"Опубликовано: {approved}"
     if skipped:
         msg += f". Пропущено (нет активных тарифов с остатком): {skipped}"
@@ -68,16 +62,10 @@ def publish_events(modeladmin, request, queryset):
 @admin.action(description="Отклонить (с комментарием)")
 def reject_events(modeladmin, request, queryset):
     comment = request.POST.get("comment", "").strip()
-    updated = 0
-    for ev in queryset:
-        ev.status = Event.Status.REJECTED
-        ev.moderated_by = request.user
-        if comment:
-            ev.moderation_comment = comment
-            ev.save(update_fields=["status", "moderated_by", "moderation_comment"])
-        else:
-            ev.save(update_fields=["status", "moderated_by"])
-        updated += 1
+    fields = {"status": Event.Status.REJECTED, "moderated_by": request.user}
+    if comment:
+        fields["moderation_comment"] = comment
+    updated = queryset.update(**fields)
     modeladmin.message_user(request, f"Отклонено: {updated}")
 
 @admin.action(description="Вернуть в черновик")
@@ -89,6 +77,34 @@ def mark_draft(modeladmin, request, queryset):
     )
     modeladmin.message_user(request, f"В черновики переведено: {updated}")
 
+# не больше стольких событий за один запуск из админки (остальное — командой generate_ai_descriptions)
+AI_ACTION_MAX_EVENTS = 50
+
+@admin.action(description="Сгенерировать описания (AI) в «Предложенное описание»")
+def generate_ai_descriptions(modeladmin, request, queryset):
+    events = list(queryset.select_related('category')[:AI_ACTION_MAX_EVENTS + 1])
+    if len(events) > AI_ACTION_MAX_EVENTS:
+        modeladmin.message_user(
+            request,
+            f"Выбрано больше {AI_ACTION_MAX_EVENTS} событий — используйте команду generate_ai_descriptions.",
+            level=messages.WARNING,
+        )
+        return
+    stats = generate_suggested_descriptions(events)
+    msg = f"Сгенерировано описаний: {stats['generated']} за {stats['elapsed']} с"
+    if stats['failed']:
+        msg += f". Ошибок: {stats['failed']}"
+    modeladmin.message_user(request, msg)
+
+@admin.action(description="Применить предложенное описание (AI)")
+def apply_suggested_descriptions(modeladmin, request, queryset):
+    updated = queryset.exclude(suggested_description="").update(
+        description=F("suggested_description"),
+        suggested_description="",
+        suggested_description_at=None,
+    )
+    modeladmin.message_user(request, f"Описание обновлено: {updated}")
+
 # --- inline ---
 class EventTariffInline(admin.TabularInline):
     model = EventTariff
@@ -98,31 +114,40 @@ class EventTariffInline(admin.TabularInline):
 
 # --- основной класс EventAdmin ---
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
+class EventAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'category', 'organizer', 'starts_at', 'status', 'available_tickets', 'is_active')
     list_filter = ('status', 'category', 'is_active')
-    search_fields = ('title', 'description', 'location')
+    list_select_related = ('category', 'organizer')
+    # только поля с trigram-индексом (описание не индексируется — поиск по нему читал бы всю таблицу)
+    search_fields = ('title', 'location')
+    search_help_text = "Название или место проведения"
+    raw_id_fields = ('organizer',)
     prepopulated_fields = {'slug': ('title',)}
     inlines = [EventTariffInline]
 
-    readonly_fields = ('published_at', 'moderated_by', 'views_count')
+    readonly_fields = ('published_at', 'moderated_by', 'views_count', 'suggested_description_at', 'series')
 
     fieldsets = (
         (None, {
             "fields": ("title", "slug", "image", "category", "organizer", "description",
                        "starts_at", "duration_minutes", "location")
         }),
+        ("Описание от AI", {
+            "fields": ("suggested_description", "suggested_description_at"),
+            "classes": ("collapse",),
+        }),
         ("Публикация", {
             "fields": ("status", "is_active", "available_tickets",
                        "published_at", "moderated_by", "moderation_comment")
         }),
         ("Системные", {
-            "fields": ("views_count",),
+            "fields": ("views_count", "series"),
         }),
     )
 
     action_form = EventActionForm
-    actions = [mark_pending, publish_events, reject_events, mark_draft]
+    actions = [mark_pending, publish_events, reject_events, mark_draft,
+               generate_ai_descriptions, apply_suggested_descriptions]
 
 @admin.register(PendingEvent)
 class PendingEventAdmin(EventAdmin):
@@ -143,6 +168,14 @@ class PendingEventAdmin(EventAdmin):
     list_filter = ('category',)
 
 
+@admin.register(EventSeries)
+class EventSeriesAdmin(admin.ModelAdmin):
+    list_display = ('id', 'template', 'organizer', 'frequency', 'interval', 'until', 'count', 'created_at')
+    list_filter = ('frequency',)
+    list_select_related = ('template', 'organizer')
+    raw_id_fields = ('template', 'organizer')
+
+
 # --- АДМИНКА ДЛЯ EVENTEDITREQUEST ---
 @admin.register(EventEditRequest)
 class EventEditRequestAdmin(admin.ModelAdmin):
@@ -175,9 +208,11 @@ class EventEditRequestAdmin(admin.ModelAdmin):
             e.category = req.new_category
             if req.new_image:
                 # Если новое изображение загружено, заменяем его.
+                # Производные уже созданы для файла заявки — переносим и размеры.
                 e.image = req.new_image
+                e.image_width, e.image_height = req.new_image_width, req.new_image_height
             # Сохраняем событие
-            e.save(update_fields=['description', 'category', 'image'])
+            e.save(update_fields=['description', 'category', 'image', 'image_width', 'image_height'])
             
             # помечаем заявку
             req.status = EventEditRequest.Status.APPROVED
@@ -1,8 +1,9 @@
 from django import forms
+from django.conf import settings
 from django.forms import inlineformset_factory
-from django.utils.text import slugify
 
-from .models import Event, EventTariff, EventEditRequest
+from .models import Category, Event, EventSeries, EventTariff, EventEditRequest, generate_unique_slug
+from .services.importer import MAX_INT
 
 class EventForm(forms.ModelForm):
     # Удобный ввод даты/времени
@@ -19,14 +20,7 @@ class EventForm(forms.ModelForm):
         return self.cleaned_data["title"].strip()
 
     def _generate_unique_slug(self, title: str) -> str:
-        base = slugify(title)[:120] or "event"
-        slug = base
-        i = 2
-        Model = self._meta.model
-        while Model.objects.filter(slug=slug).exists():
-            slug = f"{base}-{i}"
-            i += 1
-        return slug
+        return generate_unique_slug(self.instance, title, max_len=140)
 
     def save(self, organizer, commit=True):
         """Сохраняем событие и назначаем организатора.
@@ -70,4 +64,80 @@ class EventEditRequestForm(forms.ModelForm):
         }
         widgets = {
             'new_description': forms.Textarea(attrs={'rows': 8}),
-        }
\ No newline at end of file
+        }
+
+class EventImportForm(forms.Form):
+    file = forms.FileField(label="Файл (.csv, .json, .jsonl)")
+    submit_for_moderation = forms.BooleanField(
+        label="Сразу отправить на модерацию", required=False,
+        help_text="Иначе события создаются черновиками.",
+    )
+    dry_run = forms.BooleanField(label="Только проверить, ничего не создавать", required=False)
+
+    def clean_file(self):
+        f = self.cleaned_data["file"]
+        limit = settings.EVENT_IMPORT_MAX_FILE_SIZE
+        if f.size > limit:
+            raise forms.ValidationError(f"Файл больше {limit // (1024 * 1024)} МБ — разбейте его на части.")
+        return f
+
+
+WEEKDAY_CHOICES = [(0, 'Пн'), (1, 'Вт'), (2, 'Ср'), (3, 'Чт'), (4, 'Пт'), (5, 'Сб'), (6, 'Вс')]
+
+
+class EventSeriesForm(forms.Form):
+    """Правило повторения для серии показов на основе существующего события."""
+    frequency = forms.ChoiceField(label="Повторять", choices=EventSeries.Frequency.choices,
+                                  initial=EventSeries.Frequency.WEEKLY)
+    interval = forms.IntegerField(label="Интервал (каждый N-й день/неделю)", min_value=1, max_value=52, initial=1)
+    weekdays = forms.TypedMultipleChoiceField(
+        label="Дни недели", choices=WEEKDAY_CHOICES, coerce=int, required=False,
+        widget=forms.CheckboxSelectMultiple,
+        help_text="Для еженедельной серии; по умолчанию — день недели исходного события.",
+    )
+    until = forms.DateField(label="До даты (включительно)", required=False,
+                            widget=forms.DateInput(attrs={"type": "date"}))
+    count = forms.IntegerField(label="Всего показов (вместе с исходным)", min_value=2,
+                               max_value=settings.EVENT_SERIES_MAX_OCCURRENCES, required=False)
+    submit_for_moderation = forms.BooleanField(label="Сразу отправить показы на модерацию", required=False)
+
+    def clean(self):
+        data = super().clean()
+        if not data.get("until") and not data.get("count") and "count" not in self.errors:
+            raise forms.ValidationError("Укажите дату окончания серии или число показов.")
+        return data
+
+
+class EventSeriesBulkEditForm(forms.Form):
+    """Массовая правка будущих показов серии: пустое поле — без изменений."""
+    title = forms.CharField(label="Название", max_length=255, required=False)
+    category = forms.ModelChoiceField(label="Категория", queryset=Category.objects.all(), required=False)
+    description = forms.CharField(label="Описание", required=False, widget=forms.Textarea(attrs={"rows": 6}))
+    location = forms.CharField(label="Локация", max_length=255, required=False)
+    duration_minutes = forms.IntegerField(label="Длительность, мин", min_value=0, max_value=MAX_INT, required=False)
+    start_time = forms.TimeField(label="Новое время начала", required=False,
+                                 widget=forms.TimeInput(attrs={"type": "time"}))
+
+    def __init__(self, *args, tariffs=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        # по паре полей (цена, квота) на каждый тариф серии
+        self.tariffs = list(tariffs)
+        for tariff in self.tariffs:
+            self.fields[f"price_{tariff.pk}"] = forms.DecimalField(
+                label=f"{tariff.name}: цена", min_value=0, max_digits=10, decimal_places=2, required=False)
+            self.fields[f"quantity_{tariff.pk}"] = forms.IntegerField(
+                label=f"{tariff.name}: квота", min_value=0, max_value=MAX_INT, required=False)
+
+    def changed_fields(self) -> dict:
+        return {name: self.cleaned_data[name]
+                for name in ("title", "category", "description", "location", "duration_minutes")
+                if self.cleaned_data.get(name) not in (None, "")}
+
+    def tariff_changes(self) -> dict:
+        changes = {}
+        for tariff in self.tariffs:
+            price = self.cleaned_data.get(f"price_{tariff.pk}")
+            quantity = self.cleaned_data.get(f"quantity_{tariff.pk}")
+            if price is not None or quantity is not None:
+                changes[tariff.pk] = {"price": price, "quantity": quantity}
+        return changes
@@ -0,0 +1,90 @@
+import os
+import resource
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from events.models import Category, Event, EventTariff, Tariff
+from events.services.export import iter_tickets_csv
+from tickets.models import Order, Ticket
+
+
+def _rss_bytes() -> int:
+    """Текущий RSS процесса (Linux: /proc/self/statm), иначе — пиковый из getrusage."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк потокового CSV-экспорта билетов: создаёт временное событие с N билетами "
+        "(в транзакции, которая затем откатывается) и замеряет время и прирост RSS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000, 500000],
+                            help='Количество билетов для замеров (по возрастанию)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--sample-every', type=int, default=1000,
+                            help='Как часто (в строках) снимать RSS во время выгрузки')
+
+    def handle(self, *args, **opts):
+        sizes = sorted(opts['sizes'])
+        with transaction.atomic():
+            event, order, et = self._make_event()
+            created = 0
+            self.stdout.write(f"{'tickets':>10} {'seconds':>8} {'rows/s':>10} {'base MB':>8} {'peak +MB':>9}")
+            for size in sizes:
+                created = self._fill(event, order, et, created, size, opts['batch_size'])
+                self._measure(event, size, opts['sample_every'])
+            transaction.set_rollback(True)
+
+    def _make_event(self):
+        User = get_user_model()
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        organizer = User.objects.create(username=f'bench-org-{suffix}', email=f'org-{suffix}@bench.local',
+                                        is_organizer=True)
+        buyer = User.objects.create(username=f'bench-buyer-{suffix}', email=f'buyer-{suffix}@bench.local',
+                                    first_name='Иван', last_name='Петров')
+        category, _ = Category.objects.get_or_create(name='Бенчмарк', defaults={'slug': f'bench-{suffix}'})
+        tariff, _ = Tariff.objects.get_or_create(name='Бенчмарк')
+        event = Event.objects.create(title=f'Бенчмарк экспорта {suffix}', category=category, organizer=organizer,
+                                     starts_at=timezone.now(), location='—')
+        et = EventTariff.objects.create(event=event, tariff=tariff, price=Decimal('1000.00'),
+                                        available_quantity=10 ** 9)
+        order = Order.objects.create(user=buyer, total_price=Decimal('0'), status=Order.Status.PAID)
+        return event, order, et
+
+    def _fill(self, event, order, et, created, target, batch_size):
+        while created < target:
+            n = min(batch_size, target - created)
+            Ticket.objects.bulk_create([
+                Ticket(order=order, user_id=order.user_id, event=event, event_tariff=et,
+                       qr_hash=Ticket.make_qr_hash(), is_used=bool(i % 2))
+                for i in range(n)
+            ])
+            created += n
+        return created
+
+    def _measure(self, event, size, sample_every):
+        base = _rss_bytes()
+        peak = base
+        started = time.perf_counter()
+        rows = 0
+        for _chunk in iter_tickets_csv(event):
+            rows += 1
+            if rows % sample_every == 0:
+                peak = max(peak, _rss_bytes())
+        elapsed = time.perf_counter() - started
+        peak = max(peak, _rss_bytes())
+        self.stdout.write(
+            f"{size:>10} {elapsed:>8.2f} {size / elapsed if elapsed else 0:>10.0f} "
+            f"{base / 2 ** 20:>8.1f} {(peak - base) / 2 ** 20:>9.1f}"
+        )
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from events.models import Event
+from events.services.ai import generate_suggested_descriptions
+
+
+class Command(BaseCommand):
+    help = (
+        "Пакетная генерация описаний мероприятий через YandexGPT (пул потоков, лимит RATE_LIMITS['ai_batch']). "
+        "Результат сохраняется в «Предложенное описание», само описание не меняется."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', nargs='+', type=int, help='Только эти события')
+        parser.add_argument('--status', default=Event.Status.DRAFT, choices=Event.Status.values,
+                            help='Статус событий (по умолчанию черновики)')
+        parser.add_argument('--organizer', type=int, help='ID организатора')
+        parser.add_argument('--overwrite', action='store_true',
+                            help='Перегенерировать, даже если предложенное описание уже есть')
+        parser.add_argument('--limit', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=settings.YANDEX_GPT_BATCH_WORKERS)
+
+    def handle(self, *args, **opts):
+        qs = Event.objects.select_related('category').order_by('id')
+        if opts['ids']:
+            qs = qs.filter(pk__in=opts['ids'])
+        else:
+            qs = qs.filter(status=opts['status'])
+        if opts['organizer']:
+            qs = qs.filter(organizer_id=opts['organizer'])
+        if not opts['overwrite']:
+            qs = qs.filter(suggested_description='')
+
+        events = list(qs[:opts['limit']])
+        self.stdout.write(f"Событий к генерации: {len(events)} (потоков: {opts['workers']})")
+        stats = generate_suggested_descriptions(events, workers=opts['workers'])
+        self.stdout.write(
+            f"Сгенерировано: {stats['generated']}, ошибок: {stats['failed']} за {stats['elapsed']} с"
+        )
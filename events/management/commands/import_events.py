@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from events.models import Event
+from events.services.importer import IMPORT_BATCH_SIZE, ImportFormatError, detect_format, import_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Массовый импорт мероприятий организатора из CSV/JSON/JSONL: потоковая проверка строк, "
+        "слаги пачкой одним запросом, bulk_create событий и тарифов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл импорта (.csv, .json, .jsonl)')
+        parser.add_argument('--organizer', required=True, help='ID или логин организатора')
+        parser.add_argument('--format', choices=['csv', 'json', 'jsonl'], help='По умолчанию — по расширению файла')
+        parser.add_argument('--status', default=Event.Status.DRAFT,
+                            choices=[Event.Status.DRAFT, Event.Status.PENDING])
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить файл')
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        by_pk = opts['organizer'].isascii() and opts['organizer'].isdigit()
+        lookup = {'pk': opts['organizer']} if by_pk else {'username': opts['organizer']}
+        organizer = User.objects.filter(is_organizer=True, **lookup).first()
+        if organizer is None:
+            raise CommandError(f"Организатор «{opts['organizer']}» не найден.")
+
+        started = time.perf_counter()
+        try:
+            fmt = opts['format'] or detect_format(opts['path'])
+            with open(opts['path'], 'rb') as f:
+                stats = import_events(f, fmt, organizer, status=opts['status'],
+                                      batch_size=opts['batch_size'], dry_run=opts['dry_run'])
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+        except UnicodeDecodeError:
+            raise CommandError("Файл должен быть в кодировке UTF-8.")
+
+        for line_no, message in stats['errors']:
+            self.stderr.write(f"строка {line_no}: {message}")
+        verb = "Проверено, можно создать" if opts['dry_run'] else "Создано"
+        self.stdout.write(
+            f"Строк: {stats['rows']}. {verb} событий: {stats['created']} (тарифов: {stats['tariffs']}, "
+            f"пачек: {stats['batches']}), ошибок: {stats['error_count']} за {time.perf_counter() - started:.1f} с"
+        )
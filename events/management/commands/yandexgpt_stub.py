@@ -0,0 +1,96 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+def _fake_text(prompt: str) -> str:
+    # детерминированный «ответ модели» по данным из промпта
+    fields = dict(line.split(': ', 1) for line in prompt.splitlines() if ': ' in line)
+    title = fields.get('Название', 'Мероприятие')
+    extra = ', '.join(v for k, v in fields.items() if k != 'Название')
+    return (f"«{title}» — событие, которое стоит увидеть. "
+            f"{('Что известно: ' + extra + '. ') if extra else ''}"
+            "Приходите с друзьями: будет интересно, тепло и запоминающе.")
+
+
+def _make_handler(opts: dict):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, fmt, *args):
+            if opts['verbosity'] > 1:
+                super().log_message(fmt, *args)
+
+        def _json(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, data: bytes):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.flush()
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            data = json.loads(self.rfile.read(length) or b'{}')
+            latency = max(opts['latency_ms'] + random.uniform(-opts['jitter_ms'], opts['jitter_ms']), 0) / 1000
+            if random.random() < opts['error_rate']:
+                time.sleep(latency)
+                return self._json(503, {'error': {'grpcCode': 14, 'message': 'stub: unavailable'}})
+
+            prompt = next((m['text'] for m in data.get('messages', []) if m.get('role') == 'user'), '')
+            text = _fake_text(prompt)
+            if not (data.get('completionOptions') or {}).get('stream'):
+                time.sleep(latency)
+                return self._json(200, {'result': {'alternatives': [
+                    {'message': {'role': 'assistant', 'text': text}, 'status': 'ALTERNATIVE_STATUS_FINAL'}
+                ]}})
+
+            # stream: строки JSON с накопленным текстом, как у YandexGPT
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            words = text.split(' ')
+            for i in range(1, len(words) + 1):
+                time.sleep(latency / len(words))
+                status = 'ALTERNATIVE_STATUS_FINAL' if i == len(words) else 'ALTERNATIVE_STATUS_PARTIAL'
+                line = {'result': {'alternatives': [
+                    {'message': {'role': 'assistant', 'text': ' '.join(words[:i])}, 'status': status}
+                ]}}
+                self._chunk((json.dumps(line, ensure_ascii=False) + '\n').encode('utf-8'))
+            self._chunk(b'')
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = (
+        "Локальная заглушка YandexGPT /completion (обычный и потоковый ответ) с настраиваемой задержкой "
+        "и долей ошибок — для проверки генерации описаний без сети. "
+        "Запустите и укажите YANDEX_GPT_API_URL=http://<host>:<port>/foundationModels/v1/completion."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8020)
+        parser.add_argument('--latency-ms', type=float, default=800, help='Средняя длительность генерации')
+        parser.add_argument('--jitter-ms', type=float, default=200)
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503 (0..1)')
+
+    def handle(self, *args, **opts):
+        server = ThreadingHTTPServer((opts['host'], opts['port']), _make_handler(opts))
+        self.stdout.write(f"YandexGPT stub: http://{opts['host']}:{opts['port']}/foundationModels/v1/completion "
+                          f"(latency {opts['latency_ms']}±{opts['jitter_ms']} ms, errors {opts['error_rate']:.0%})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_pendingevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='suggested_description',
+            field=models.TextField(blank=True, verbose_name='Предложенное описание (AI)'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='suggested_description_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Описание предложено'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_event_trgm_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('daily', 'Ежедневно'), ('weekly', 'Еженедельно')], default='weekly', max_length=10, verbose_name='Повторять')),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Каждый N-й день/неделю', verbose_name='Интервал')),
+                ('weekdays', models.CharField(blank=True, max_length=20, verbose_name='Дни недели')),
+                ('until', models.DateField(blank=True, null=True, verbose_name='До даты (включительно)')),
+                ('count', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Всего показов')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('organizer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_series', to=settings.AUTH_USER_MODEL, verbose_name='Организатор')),
+                ('template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='events.event', verbose_name='Шаблон')),
+            ],
+            options={
+                'verbose_name': 'Серия показов',
+                'verbose_name_plural': 'Серии показов',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='events.eventseries', verbose_name='Серия'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['series', 'starts_at'], name='event_series_starts_idx'),
+        ),
+    ]
@@ -1,25 +1,56 @@
 from django.conf import settings
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db.models import Q
+from django.db.models.functions import Upper
 from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from datetime import timedelta
 
-# генерация уникального слага
+# генерация уникальных слагов: один запрос по префиксу на весь набор значений,
+# дальше суффиксы -2, -3, ... подбираются в памяти
+SLUG_SUFFIX_RESERVE = 8  # место под суффикс "-NNNNNNN" при обрезке базы
+
+
+def allocate_unique_slugs(Model, values, slug_field_name: str = 'slug', max_len: int = 60,
+                          exclude_pk=None) -> list:
+    """
+    Уникальные слаги для списка значений (заголовков), в том же порядке.
+    Занятые слаги читаются одним SELECT по префиксам всех баз; повторы внутри набора тоже учитываются.
+    """
+    bases = [(slugify(v) or 'event')[:max_len] for v in values]
+    if not bases:
+        return []
+    prefixes = {b[:max_len - SLUG_SUFFIX_RESERVE] for b in bases}
+    cond = Q()
+    for prefix in prefixes:
+        cond |= Q(**{f'{slug_field_name}__startswith': prefix})
+    qs = Model.objects.filter(cond)
+    if exclude_pk is not None:
+        qs = qs.exclude(pk=exclude_pk)
+    taken = set(qs.values_list(slug_field_name, flat=True))
+    taken |= getattr(Model, 'RESERVED_SLUGS', set())
+
+    slugs = []
+    next_n = {}
+    for base in bases:
+        slug = base
+        n = next_n.get(base, 2)
+        while slug in taken:
+            suffix = f'-{n}'
+            slug = base[:max_len - len(suffix)] + suffix
+            n += 1
+        next_n[base] = n
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
 def generate_unique_slug(instance, value, slug_field_name: str = 'slug', max_len: int = 60) -> str:
-    base = slugify(value) or 'event'
-    base = base[:max_len]
-    slug = base
-    Model = instance.__class__
-    n = 2
-    # Проверяем, есть ли уже объект с таким слагом, если есть, добавляем суффикс
-    while Model.objects.filter(**{slug_field_name: slug}).exclude(pk=instance.pk).exists():
-        suffix = f'-{n}'
-        slug = (base[:max_len - len(suffix)] + suffix)
-        n += 1
-    return slug
+    return allocate_unique_slugs(instance.__class__, [value], slug_field_name, max_len,
+                                 exclude_pk=instance.pk)[0]
 
 # категории мероприятий
 class Category(models.Model):
@@ -60,6 +91,9 @@ class Event(models.Model):
     title = models.CharField('Название', max_length=255)
     slug = models.SlugField('Слаг', max_length=140, unique=True)
     image = models.ImageField('Афиша', upload_to='events/', blank=True, null=True)
+    # размеры афиши; заполняются после создания производных (core.images), NULL — ещё не обработана
+    image_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    image_height = models.PositiveIntegerField(blank=True, null=True, editable=False)
     # Связь с категорией (при удалении категории мероприятия остаются - PROTECT)
     category = models.ForeignKey(
         Category, on_delete=models.PROTECT, related_name='events', verbose_name='Категория'
@@ -74,6 +108,9 @@ class Event(models.Model):
     )
     
     description = models.TextField('Описание', blank=True)
+    # описание, предложенное AI (пакетная генерация); в description попадает только после применения
+    suggested_description = models.TextField('Предложенное описание (AI)', blank=True)
+    suggested_description_at = models.DateTimeField('Описание предложено', blank=True, null=True)
     starts_at = models.DateTimeField('Дата и время начала')
     # Длительность в минутах. может быть null, если длительность неизвестна
     duration_minutes = models.PositiveIntegerField('Длительность, мин', blank=True, null=True)
@@ -95,6 +132,11 @@ class Event(models.Model):
     available_tickets = models.PositiveIntegerField('Остаток билетов (денорм.)', default=0)
     views_count = models.PositiveIntegerField('Просмотры', default=0)
     is_active = models.BooleanField('Активно', default=True)
+    # серия повторяющихся показов, к которой относится событие (см. EventSeries)
+    series = models.ForeignKey(
+        'EventSeries', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='occurrences', verbose_name='Серия',
+    )
 
     created_at = models.DateTimeField('Создано', auto_now_add=True)
     updated_at = models.DateTimeField('Обновлено', auto_now=True)
@@ -109,6 +151,13 @@ class Event(models.Model):
         indexes = [
             models.Index(fields=['slug']), # Индекс для быстрого поиска по слагу
             models.Index(fields=['status', 'starts_at']), # Индекс для фильтрации по статусу и сортировки по дате
+            # поиск по части названия/места (icontains -> UPPER(...) LIKE, поэтому индекс по UPPER)
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='event_title_trgm_idx'),
+            GinIndex(OpClass(Upper('location'), name='gin_trgm_ops'), name='event_location_trgm_idx'),
+            # кабинет организатора: события по дате начала (курсорная пагинация)
+            models.Index(fields=['organizer', 'starts_at'], name='event_organizer_starts_idx'),
+            # будущие показы серии (массовые правки)
+            models.Index(fields=['series', 'starts_at'], name='event_series_starts_idx'),
         ]
 
     def __str__(self):
@@ -175,6 +224,40 @@ class EventTariff(models.Model):
         return max(aq - sc, 0)
 
 
+# серия повторяющихся показов: шаблонное событие с тарифами + правило повторения
+class EventSeries(models.Model):
+    class Frequency(models.TextChoices):
+        DAILY = 'daily', 'Ежедневно'
+        WEEKLY = 'weekly', 'Еженедельно'
+
+    organizer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                  related_name='event_series', verbose_name='Организатор')
+    # событие, с которого скопированы поля и тарифы показов
+    template = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='+', verbose_name='Шаблон')
+    frequency = models.CharField('Повторять', max_length=10, choices=Frequency.choices, default=Frequency.WEEKLY)
+    interval = models.PositiveSmallIntegerField('Интервал', default=1,
+                                                help_text='Каждый N-й день/неделю')
+    # дни недели через запятую, 0 — понедельник (только для еженедельной серии)
+    weekdays = models.CharField('Дни недели', max_length=20, blank=True)
+    until = models.DateField('До даты (включительно)', blank=True, null=True)
+    count = models.PositiveSmallIntegerField('Всего показов', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Серия показов'
+        verbose_name_plural = 'Серии показов'
+
+    def __str__(self):
+        title = self.template.title if self.template_id else f'#{self.pk}'
+        return f'Серия «{title}» ({self.get_frequency_display().lower()})'
+
+    @property
+    def weekday_list(self) -> list:
+        return sorted({int(d) for d in self.weekdays.split(',') if d.strip().isdigit() and int(d) < 7})
+
+
 # заявки на правку события организатором
 class EventEditRequest(models.Model):
     class Status(models.TextChoices):
@@ -189,6 +272,8 @@ class EventEditRequest(models.Model):
     new_description = models.TextField()
     new_category = models.ForeignKey(Category, on_delete=models.PROTECT) 
     new_image = models.ImageField(upload_to='event_edits/', blank=True, null=True)
+    new_image_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    new_image_height = models.PositiveIntegerField(blank=True, null=True, editable=False)
 
     status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING, db_index=True)
     comment = models.TextField(blank=True) # комментарий модератора
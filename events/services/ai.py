@@ -1,15 +1,138 @@
+import hashlib
 import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import httpx
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger('events')
+
+DEFAULT_SYSTEM_HINT = (
+    "Ты помощник по маркетингу культурных событий. "
+    "Пиши на русском, живо и понятно. Не выдумывай конкретные цены/время, если их нет. "
+    "Тон дружелюбный. Дай 1–2 абзаца (100–150 слов), можно список из 3–5 пунктов."
+)
+
+STATS_PREFIX = 'ai:stats:'
+STATS_COUNTERS = ('requests', 'local_hits', 'shared_hits', 'coalesced', 'upstream_calls', 'errors', 'upstream_ms')
+
 
 class YandexGPTError(Exception):
     pass
 
-def generate_event_description(prompt: str, *, system_hint: str = "", temperature: float = 0.6, max_tokens: int = 800) -> str:
-    """
-    Вызывает YandexGPT /completion и возвращает сгенерированный текст.
-    Бросает YandexGPTError при ошибке.
-    """
+
+class _LRUCache:
+    """Кэш процесса: не больше max_entries записей, каждая живёт ttl секунд."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _InFlight:
+    """Запрос к провайдеру, которого ждут одинаковые параллельные вызовы в этом процессе."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_local_cache = _LRUCache(settings.YANDEX_GPT_CACHE_MAX_ENTRIES)
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_latencies = deque(maxlen=500)  # последние задержки провайдера в этом процессе, мс
+
+
+def build_description_prompt(*, title: str = "", category: str = "", starts_at: str = "",
+                             location: str = "", keywords: str = "") -> str:
+    """User-промпт для описания мероприятия из полей формы/события."""
+    parts = []
+    if title: parts.append(f"Название: {title}")
+    if category: parts.append(f"Категория: {category}")
+    if starts_at: parts.append(f"Дата и время: {starts_at}")
+    if location: parts.append(f"Локация: {location}")
+    if keywords: parts.append(f"Ключевые слова: {keywords}")
+    return "Создай привлекательное описание мероприятия по данным:\n" + "\n".join(parts)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', (text or '').strip()).casefold()
+
+
+def make_cache_key(prompt: str, *, system_hint: str = "", temperature: float = 0.6, max_tokens: int = 800) -> str:
+    """Ключ по нормализованному промпту (регистр и пробелы не важны) и параметрам генерации."""
+    raw = json.dumps([
+        settings.YANDEX_GPT_MODEL, _normalize(prompt), _normalize(system_hint or DEFAULT_SYSTEM_HINT),
+        round(float(temperature), 2), int(max_tokens),
+    ], ensure_ascii=False)
+    return 'ai:desc:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _incr(name: str, delta: int = 1):
+    key = STATS_PREFIX + name
+    # add + incr: счётчик общий для всех процессов (при общем кэше)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+
+
+def get_ai_stats() -> dict:
+    """Счётчики кэша генерации (по всем процессам) и задержки провайдера (в этом процессе)."""
+    counters = cache.get_many([STATS_PREFIX + name for name in STATS_COUNTERS])
+    stats = {name: counters.get(STATS_PREFIX + name, 0) for name in STATS_COUNTERS}
+    served = stats['local_hits'] + stats['shared_hits'] + stats['coalesced']
+    stats['hit_rate'] = round(served / stats['requests'], 3) if stats['requests'] else 0.0
+    calls = stats['upstream_calls']
+    stats['upstream_avg_ms'] = round(stats.pop('upstream_ms') / calls, 1) if calls else None
+    recent = sorted(_latencies)
+    if recent:
+        stats['upstream_p50_ms'] = recent[len(recent) // 2]
+        stats['upstream_p95_ms'] = recent[min(int(len(recent) * 0.95), len(recent) - 1)]
+    return stats
+
+
+def reset_ai_stats():
+    cache.delete_many([STATS_PREFIX + name for name in STATS_COUNTERS])
+    _latencies.clear()
+
+
+def _build_request(prompt: str, *, system_hint: str, temperature: float, max_tokens: int, stream: bool):
     api_key = settings.YANDEX_GPT_API_KEY
     folder_id = settings.YANDEX_GPT_FOLDER_ID
     if not api_key or not folder_id:
@@ -20,28 +143,28 @@ def generate_event_description(prompt: str, *, system_hint: str = "", temperatur
         "Content-Type": "application/json",
     }
 
-    system_text = system_hint or (
-        "Ты помощник по маркетингу культурных событий. "
-        "Пиши на русском, живо и понятно. Не выдумывай конкретные цены/время, если их нет. "
-        "Тон дружелюбный. Дай 1–2 абзаца (100–150 слов), можно список из 3–5 пунктов."
-    )
-
     payload = {
-        "modelUri": f"gpt://{folder_id}/yandexgpt/latest",
+        "modelUri": f"gpt://{folder_id}/{settings.YANDEX_GPT_MODEL}",
         "completionOptions": {
-            "stream": False,
+            "stream": stream,
             "temperature": temperature,
             "maxTokens": max_tokens
         },
         "messages": [
-            {"role": "system", "text": system_text},
+            {"role": "system", "text": system_hint or DEFAULT_SYSTEM_HINT},
             {"role": "user", "text": prompt},
         ]
     }
+    return headers, payload
+
+
+def _request_completion(prompt: str, *, system_hint: str, temperature: float, max_tokens: int) -> str:
+    headers, payload = _build_request(prompt, system_hint=system_hint, temperature=temperature,
+                                      max_tokens=max_tokens, stream=False)
 
     try:
         resp = requests.post(
-            "https://llm.api.cloud.yandex.net/foundationModels/v1/completion",
+            settings.YANDEX_GPT_API_URL,
             headers=headers,
             json=payload,
             timeout=settings.YANDEX_GPT_TIMEOUT
@@ -62,3 +185,227 @@ def generate_event_description(prompt: str, *, system_hint: str = "", temperatur
         return data["result"]["alternatives"][0]["message"]["text"]
     except Exception as e:
         raise YandexGPTError(f"Bad response format: {e}")
+
+
+def _call_upstream(key: str, prompt: str, **params) -> str:
+    """Один запрос к провайдеру; результат кладётся в общий кэш и кэш процесса."""
+    started = time.perf_counter()
+    try:
+        text = _request_completion(prompt, **params)
+    except YandexGPTError:
+        _incr('errors')
+        raise
+    finally:
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        _latencies.append(elapsed_ms)
+        _incr('upstream_calls')
+        _incr('upstream_ms', elapsed_ms)
+    cache.set(key, text, settings.YANDEX_GPT_CACHE_TTL)
+    _local_cache.set(key, text, settings.YANDEX_GPT_CACHE_TTL)
+    return text
+
+
+def _wait_for_other_process(key: str):
+    """Другой процесс уже спрашивает провайдера: ждём его ответ в общем кэше (не дольше таймаута API)."""
+    deadline = time.monotonic() + settings.YANDEX_GPT_TIMEOUT
+    lock_key = key + ':lock'
+    while time.monotonic() < deadline:
+        time.sleep(0.25)
+        text = cache.get(key)
+        if text is not None:
+            return text
+        if cache.get(lock_key) is None:
+            return None  # тот процесс завершился ошибкой — запросим сами
+    return None
+
+
+def generate_event_description(prompt: str, *, system_hint: str = "", temperature: float = 0.6,
+                               max_tokens: int = 800, use_cache: bool = True) -> str:
+    """
+    Вызывает YandexGPT /completion и возвращает сгенерированный текст.
+    Ответы кэшируются по нормализованному промпту и параметрам (кэш процесса с LRU + общий кэш, TTL
+    YANDEX_GPT_CACHE_TTL); одинаковые параллельные запросы ждут один вызов провайдера.
+    Бросает YandexGPTError при ошибке.
+    """
+    params = {'system_hint': system_hint, 'temperature': temperature, 'max_tokens': max_tokens}
+    if not use_cache:
+        return _request_completion(prompt, **params)
+
+    key = make_cache_key(prompt, **params)
+    _incr('requests')
+
+    text = _local_cache.get(key)
+    if text is not None:
+        _incr('local_hits')
+        return text
+    text = cache.get(key)
+    if text is not None:
+        _incr('shared_hits')
+        _local_cache.set(key, text, settings.YANDEX_GPT_CACHE_TTL)
+        return text
+
+    # коалесцирование в процессе: первый поток делает запрос, остальные ждут его результат
+    with _in_flight_lock:
+        flight = _in_flight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[key] = _InFlight()
+    if not leader:
+        _incr('coalesced')
+        flight.done.wait(settings.YANDEX_GPT_TIMEOUT + 5)
+        if flight.error is not None:
+            raise flight.error
+        if flight.result is None:
+            raise YandexGPTError("Upstream request timed out")
+        return flight.result
+
+    try:
+        # между процессами: запрос делает тот, кто взял блокировку в общем кэше
+        lock_key = key + ':lock'
+        locked = cache.add(lock_key, 1, timeout=settings.YANDEX_GPT_TIMEOUT + 5)
+        if not locked:
+            text = _wait_for_other_process(key)
+            if text is not None:
+                _incr('coalesced')
+                _local_cache.set(key, text, settings.YANDEX_GPT_CACHE_TTL)
+                flight.result = text
+                return text
+            # тот процесс упал или не уложился в таймаут: пробуем взять блокировку сами;
+            # если её уже взял кто-то ещё, спрашиваем провайдера без неё, но чужую блокировку не снимаем
+            locked = cache.add(lock_key, 1, timeout=settings.YANDEX_GPT_TIMEOUT + 5)
+        try:
+            flight.result = _call_upstream(key, prompt, **params)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return flight.result
+    except YandexGPTError as e:
+        flight.error = e
+        raise
+    finally:
+        flight.done.set()
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+async def stream_event_description(prompt: str, *, system_hint: str = "", temperature: float = 0.6,
+                                   max_tokens: int = 800):
+    """
+    Асинхронный генератор фрагментов текста описания (completionOptions.stream=True, клиент httpx).
+    YandexGPT присылает строки JSON с накопленным текстом — отдаём только новые символы.
+    Готовый ответ из кэша отдаётся одним фрагментом; полный ответ провайдера кладётся в кэш.
+    Бросает YandexGPTError при ошибке.
+    """
+    params = {'system_hint': system_hint, 'temperature': temperature, 'max_tokens': max_tokens}
+    key = make_cache_key(prompt, **params)
+    await sync_to_async(_incr)('requests')
+
+    text, hit = _local_cache.get(key), 'local_hits'
+    if text is None:
+        text, hit = await cache.aget(key), 'shared_hits'
+        if text is not None:
+            _local_cache.set(key, text, settings.YANDEX_GPT_CACHE_TTL)
+    if text is not None:
+        await sync_to_async(_incr)(hit)
+        yield text
+        return
+
+    headers, payload = _build_request(prompt, stream=True, **params)
+    timeout = httpx.Timeout(settings.YANDEX_GPT_TIMEOUT, connect=5)
+    started = time.perf_counter()
+    text = ''
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            async with client.stream('POST', settings.YANDEX_GPT_API_URL, headers=headers, json=payload) as resp:
+                if resp.status_code != 200:
+                    err = (await resp.aread()).decode('utf-8', 'replace')
+                    raise YandexGPTError(f"API error {resp.status_code}: {err}")
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    try:
+                        chunk = json.loads(line)["result"]["alternatives"][0]["message"]["text"]
+                    except Exception as e:
+                        raise YandexGPTError(f"Bad response format: {e}")
+                    if len(chunk) > len(text):
+                        delta, text = chunk[len(text):], chunk
+                        yield delta
+    except httpx.HTTPError as e:
+        await sync_to_async(_incr)('errors')
+        raise YandexGPTError(f"Network error: {e}") from e
+    except YandexGPTError:
+        await sync_to_async(_incr)('errors')
+        raise
+    finally:
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        _latencies.append(elapsed_ms)
+        await sync_to_async(_incr)('upstream_calls')
+        await sync_to_async(_incr)('upstream_ms', elapsed_ms)
+
+    if text:
+        await cache.aset(key, text, settings.YANDEX_GPT_CACHE_TTL)
+        _local_cache.set(key, text, settings.YANDEX_GPT_CACHE_TTL)
+
+
+def _event_prompt(event) -> str:
+    starts_at = timezone.localtime(event.starts_at).strftime('%d.%m.%Y %H:%M') if event.starts_at else ""
+    return build_description_prompt(title=event.title, category=event.category.name,
+                                    starts_at=starts_at, location=event.location)
+
+
+def generate_suggested_descriptions(events, *, workers: int = None, save_every: int = 50) -> dict:
+    """
+    Пакетная генерация: для каждого события из events запрашивает описание у YandexGPT
+    пулом из workers потоков и сохраняет его в suggested_description (bulk_update пачками).
+    Запросы к провайдеру проходят через лимит RATE_LIMITS['ai_batch'] (общий для всех процессов):
+    задача отдаётся в пул только после получения токена. Потоки делают только HTTP — БД трогает
+    лишь основной поток. Возвращает {'generated', 'failed', 'elapsed'}.
+    """
+    from core.ratelimit import consume, parse_rate
+    from events.models import Event
+
+    workers = workers or settings.YANDEX_GPT_BATCH_WORKERS
+    capacity, refill = parse_rate(settings.RATE_LIMITS['ai_batch'])
+    started = time.perf_counter()
+    stats = {'generated': 0, 'failed': 0}
+    done = []
+
+    def flush():
+        if done:
+            Event.objects.bulk_update(done, ['suggested_description', 'suggested_description_at'])
+            done.clear()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for event in events:
+            while True:
+                allowed, retry_after = consume('ai_batch:all', capacity, refill)
+                if allowed:
+                    break
+                time.sleep(retry_after)
+            futures[pool.submit(generate_event_description, _event_prompt(event))] = event
+            # не копим в памяти больше, чем нужно: готовые результаты сохраняем по ходу
+            if len(futures) >= workers * 2:
+                finished = next(as_completed(futures))
+                _collect(finished, futures.pop(finished), done, stats)
+                if len(done) >= save_every:
+                    flush()
+        for finished in as_completed(futures):
+            _collect(finished, futures[finished], done, stats)
+            if len(done) >= save_every:
+                flush()
+    flush()
+    stats['elapsed'] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def _collect(future, event, done: list, stats: dict):
+    try:
+        event.suggested_description = future.result().strip()
+    except YandexGPTError as e:
+        logger.warning("AI description for event %s failed: %s", event.pk, e)
+        stats['failed'] += 1
+        return
+    event.suggested_description_at = timezone.now()
+    done.append(event)
+    stats['generated'] += 1
@@ -0,0 +1,22 @@
+# events/services/availability.py
+"""
+Денормализованный остаток билетов события (Event.available_tickets) для массовых операций.
+Сигналы EventTariff пересчитывают его по одному событию и при bulk_create/update не срабатывают,
+поэтому импорт и серии пересчитывают остаток набором событий одним UPDATE.
+"""
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from events.models import Event, EventTariff
+
+
+def recompute_available_tickets(event_ids):
+    """Остаток билетов (сумма активных тарифов: квота − продано) одним UPDATE для набора событий."""
+    remaining = (EventTariff.objects
+                 .filter(event=OuterRef('pk'), is_active=True)
+                 .values('event')
+                 .annotate(total=Sum(Greatest(F('available_quantity') - F('sales_count'), 0)))
+                 .values('total'))
+    return Event.objects.filter(pk__in=event_ids).update(
+        available_tickets=Coalesce(Subquery(remaining, output_field=IntegerField()), 0)
+    )
@@ -0,0 +1,113 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from tickets.models import Ticket
+
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_HEADER = [
+    'ID билета', 'Покупатель', 'Email',
+    'Тариф', 'Цена', 'Использован',
+    'Дата покупки', 'QR-хэш'
+]
+
+# только нужные колонки — без сборки моделей User/EventTariff/Tariff на каждую строку
+CSV_COLUMNS = (
+    'id', 'user__first_name', 'user__last_name', 'user__username', 'user__email',
+    'event_tariff__tariff__name', 'event_tariff__price', 'is_used',
+    'created_at', 'qr_hash',
+)
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: writerow возвращает строку вместо записи в файл."""
+    def write(self, value):
+        return value
+
+
+def search_tickets(qs, q: str):
+    """
+    Поиск билетов по покупателю (имя, логин, email) или части QR-хэша.
+    Каждое слово должно встретиться хотя бы в одном поле. Поиск по полям пользователя
+    идёт подзапросом к users (там GIN trigram-индексы), по хэшу — по индексу билета.
+    """
+    words = [w for w in q.split() if w]
+    if not words:
+        return qs
+    user_q = Q()
+    for w in words:
+        user_q &= (Q(first_name__icontains=w) | Q(last_name__icontains=w)
+                   | Q(username__icontains=w) | Q(email__icontains=w))
+    buyers = get_user_model().objects.filter(user_q).values('id')
+    return qs.filter(Q(user_id__in=buyers) | Q(qr_hash__icontains=q.strip().lower()))
+
+
+def _parse_date(value):
+    # несуществующая дата (2024-02-30) — ValueError из parse_date: фильтр не применяем, как и нераспознанный
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def apply_ticket_filters(qs, params):
+    """
+    Фильтры списка билетов из GET-параметров:
+      q — поиск по покупателю или QR-хэшу, tariff — id тарифа события (EventTariff),
+      used — '1'/'0', date_from / date_to — дата покупки (YYYY-MM-DD, включительно).
+    """
+    q = (params.get('q') or '').strip()
+    if q:
+        qs = search_tickets(qs, q)
+
+    tariff = (params.get('tariff') or '').strip()
+    # isdigit() пропускает '²', на котором int() падает
+    if tariff.isascii() and tariff.isdigit():
+        qs = qs.filter(event_tariff_id=int(tariff))
+
+    used = params.get('used')
+    if used in ('1', '0'):
+        qs = qs.filter(is_used=(used == '1'))
+
+    date_from = _parse_date(params.get('date_from'))
+    if date_from:
+        qs = qs.filter(created_at__date__gte=date_from)
+    date_to = _parse_date(params.get('date_to'))
+    if date_to:
+        qs = qs.filter(created_at__date__lte=date_to)
+    return qs
+
+
+def iter_tickets_csv(event, params=None, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Генератор строк CSV по билетам события (для StreamingHttpResponse).
+    Читает кортежи values_list через iterator(), поэтому память не растёт с числом билетов.
+    Фильтры разбираются сразу при вызове, а не в генераторе: ошибка во входных данных
+    не должна оборвать ответ, у которого уже ушёл статус 200.
+    """
+    qs = Ticket.objects.filter(event=event)
+    if params is not None:
+        qs = apply_ticket_filters(qs, params)
+    return _iter_csv(qs, chunk_size)
+
+
+def _iter_csv(qs, chunk_size: int):
+    rows = qs.order_by('id').values_list(*CSV_COLUMNS).iterator(chunk_size=chunk_size)
+
+    writer = csv.writer(_Echo(), delimiter=';')
+    tz = timezone.get_current_timezone()
+
+    # CSV с BOM, чтобы Excel на Windows корректно читал кириллицу
+    yield '\ufeff'
+    yield writer.writerow(CSV_HEADER)
+    for (tid, first_name, last_name, username, email,
+         tariff, price, is_used, created_at, qr_hash) in rows:
+        # то же, что User.get_full_name(), но без экземпляра модели
+        buyer = f'{first_name} {last_name}'.strip() or username
+        created = created_at.astimezone(tz).strftime('%d.%m.%Y %H:%M')
+        yield writer.writerow([tid, buyer, email, tariff, str(price),
+                               'Да' if is_used else 'Нет', created, qr_hash])
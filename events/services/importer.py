@@ -0,0 +1,290 @@
+# events/services/importer.py
+"""
+Массовый импорт мероприятий организатора из CSV или JSON.
+
+Строки читаются и проверяются потоком (файл целиком в память не загружается, кроме JSON-массива),
+валидные копятся пачками по batch_size. На пачку:
+  - слаги всех событий — одним запросом по префиксам (allocate_unique_slugs);
+  - bulk_create событий и bulk_create их тарифов;
+  - available_tickets — одним UPDATE по всей пачке (сигналы EventTariff при bulk_create не срабатывают).
+
+Формат строки (колонки CSV или ключи JSON-объекта):
+  title, category (слаг или название), starts_at (ISO 8601 или ДД.ММ.ГГГГ ЧЧ:ММ), location,
+  duration_minutes, description — необязательные,
+  tariffs — "Название:цена:квота|..." (разделитель тарифов "|" или ";") или (в JSON)
+  список {"tariff", "price", "quantity"}.
+"""
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from events.models import Category, Event, EventTariff, Tariff, allocate_unique_slugs
+from events.services.availability import recompute_available_tickets
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 200
+# верхняя граница integer-колонок PostgreSQL (duration_minutes, available_quantity)
+MAX_INT = 2147483647
+FORMATS = ('csv', 'json', 'jsonl')
+
+
+class ImportFormatError(ValueError):
+    """Файл целиком не читается (неизвестный формат, нет обязательных колонок, битый JSON)."""
+
+
+def detect_format(filename: str) -> str:
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if ext == 'ndjson':
+        ext = 'jsonl'
+    if ext not in FORMATS:
+        raise ImportFormatError("Поддерживаются файлы .csv, .json и .jsonl.")
+    return ext
+
+
+def iter_rows(stream, fmt: str):
+    """
+    Генератор (номер строки, dict) из бинарного потока.
+    CSV: разделитель ';' или ',' (по заголовку), кодировка UTF-8 (BOM допускается).
+    JSON: массив объектов; JSONL: по объекту в строке.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        header = text.readline()
+        if not header.strip():
+            return
+        delimiter = ';' if header.count(';') >= header.count(',') else ','
+        try:
+            columns = [c.strip().lower() for c in next(csv.reader([header], delimiter=delimiter))]
+        except csv.Error as e:
+            raise ImportFormatError(f"Не удалось разобрать заголовок CSV: {e}")
+        if 'title' not in columns:
+            raise ImportFormatError("В CSV нет колонки title.")
+        reader = csv.reader(text, delimiter=delimiter)
+        try:
+            for values in reader:
+                if any(v.strip() for v in values):
+                    yield reader.line_num + 1, dict(zip(columns, values))
+        except csv.Error as e:
+            # например, поле длиннее csv.field_size_limit() (131072 символа)
+            raise ImportFormatError(f"Не удалось разобрать CSV: {e}")
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError:
+                yield line_no, None
+    else:
+        try:
+            data = json.load(text)
+        except ValueError as e:
+            raise ImportFormatError(f"Некорректный JSON: {e}")
+        if not isinstance(data, list):
+            raise ImportFormatError("JSON должен быть массивом объектов.")
+        yield from enumerate(data, start=1)
+
+
+class RowValidator:
+    """
+    Проверка строк импорта. Категории и тарифы читаются один раз при создании,
+    дальше строки проверяются без запросов к БД.
+    """
+
+    def __init__(self, status: str = Event.Status.DRAFT):
+        self.status = status
+        self.categories = {}
+        for pk, slug, name in Category.objects.values_list('pk', 'slug', 'name'):
+            self.categories[slug.lower()] = pk
+            self.categories[name.lower()] = pk
+        self.tariffs = {name.lower(): pk for pk, name in Tariff.objects.values_list('pk', 'name')}
+        self.tz = timezone.get_current_timezone()
+
+    def __call__(self, row):
+        """(данные события, [(tariff_id, price, quantity)]) или ValueError с текстом ошибки."""
+        if not isinstance(row, dict):
+            raise ValueError("строка должна быть JSON-объектом")
+        row = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+
+        title = str(row.get('title') or '').strip()
+        if not title:
+            raise ValueError("не указано название (title)")
+        if len(title) > 255:
+            raise ValueError("название длиннее 255 символов")
+
+        category_id = self.categories.get(str(row.get('category') or '').strip().lower())
+        if category_id is None:
+            raise ValueError(f"неизвестная категория «{row.get('category') or ''}»")
+
+        starts_at = self._parse_datetime(str(row.get('starts_at') or '').strip())
+
+        location = str(row.get('location') or '').strip()
+        if not location:
+            raise ValueError("не указано место (location)")
+        if len(location) > 255:
+            raise ValueError("место длиннее 255 символов")
+
+        duration = str(row.get('duration_minutes') or '').strip()
+        if duration and not (duration.isascii() and duration.isdigit()):
+            raise ValueError("duration_minutes должно быть целым неотрицательным числом")
+        if duration and int(duration) > MAX_INT:
+            raise ValueError("duration_minutes слишком большое")
+
+        tariffs = self._parse_tariffs(row.get('tariffs'))
+        if self.status == Event.Status.PENDING and not any(q > 0 for _, _, q in tariffs):
+            raise ValueError("для отправки на модерацию нужен тариф с положительной квотой")
+
+        event = {
+            'title': title,
+            'category_id': category_id,
+            'starts_at': starts_at,
+            'location': location,
+            'duration_minutes': int(duration) if duration else None,
+            'description': str(row.get('description') or '').strip(),
+        }
+        return event, tariffs
+
+    def _parse_datetime(self, value: str):
+        dt = parse_datetime(value)
+        if dt is None:
+            try:
+                dt = datetime.strptime(value, '%d.%m.%Y %H:%M')
+            except ValueError:
+                raise ValueError(f"некорректная дата начала «{value}»")
+        if timezone.is_naive(dt):
+            dt = timezone.make_aware(dt, self.tz)
+        return dt
+
+    def _parse_tariffs(self, raw):
+        if raw in (None, ''):
+            return []
+        if isinstance(raw, str):
+            items = []
+            for part in re.split(r'[|;]', raw):
+                if not part.strip():
+                    continue
+                name, _, rest = part.strip().rpartition(':')
+                name, _, price = name.rpartition(':')
+                items.append({'tariff': name, 'price': price, 'quantity': rest})
+        elif isinstance(raw, list):
+            items = raw
+        else:
+            raise ValueError("tariffs: ожидается строка «Название:цена:квота|...» или список")
+
+        result, seen = [], set()
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValueError("tariffs: каждый тариф — объект {tariff, price, quantity}")
+            name = str(item.get('tariff') or '').strip()
+            tariff_id = self.tariffs.get(name.lower())
+            if tariff_id is None:
+                raise ValueError(f"неизвестный тариф «{name}»")
+            if tariff_id in seen:
+                raise ValueError(f"тариф «{name}» указан дважды")
+            seen.add(tariff_id)
+            try:
+                price = Decimal(str(item.get('price')).strip().replace(',', '.'))
+            except (InvalidOperation, ValueError):
+                raise ValueError(f"тариф «{name}»: некорректная цена")
+            quantity = str(item.get('quantity')).strip()
+            if not price.is_finite() or price < 0 or price.as_tuple().exponent < -2 or price >= 10 ** 8:
+                raise ValueError(f"тариф «{name}»: некорректная цена")
+            if not (quantity.isascii() and quantity.isdigit()):
+                raise ValueError(f"тариф «{name}»: квота должна быть целым неотрицательным числом")
+            if int(quantity) > MAX_INT:
+                raise ValueError(f"тариф «{name}»: слишком большая квота")
+            result.append((tariff_id, price, int(quantity)))
+        return result
+
+
+def _create_batch(batch, organizer, status):
+    """Одна пачка валидных строк: слаги, события, тарифы, остаток. Возвращает число созданных тарифов."""
+    slugs = allocate_unique_slugs(Event, [data['title'] for data, _ in batch], max_len=140)
+    events = Event.objects.bulk_create([
+        Event(**data, slug=slug, organizer=organizer, status=status)
+        for (data, _), slug in zip(batch, slugs)
+    ])
+    tariffs = EventTariff.objects.bulk_create([
+        EventTariff(event=event, tariff_id=tariff_id, price=price, available_quantity=quantity)
+        for event, (_, rows) in zip(events, batch)
+        for tariff_id, price, quantity in rows
+    ])
+    recompute_available_tickets([e.pk for e in events])
+    return len(tariffs)
+
+
+def import_events(stream, fmt: str, organizer, *, status: str = Event.Status.DRAFT,
+                  batch_size: int = IMPORT_BATCH_SIZE, max_rows: int = None, dry_run: bool = False) -> dict:
+    """
+    Импортирует мероприятия организатора из потока. Ошибочные строки пропускаются и попадают
+    в отчёт (первые MAX_REPORTED_ERRORS), остальные создаются пачками. При dry_run только проверка:
+    created — сколько строк было бы создано.
+    Если файл перестал читаться посередине (не UTF-8, битый CSV), проверенные до этого строки
+    импортируются, а в aborted попадает (строка, текст): с неё файл не обработан.
+    Ошибка формата до первой строки данных выбрасывается как ImportFormatError / UnicodeDecodeError.
+    Возвращает {'rows', 'created', 'tariffs', 'errors': [(строка, текст)], 'error_count', 'batches', 'aborted'}.
+    """
+    validate = RowValidator(status)
+    stats = {'rows': 0, 'created': 0, 'tariffs': 0, 'errors': [], 'error_count': 0, 'batches': 0,
+             'aborted': None}
+    batch = []
+    last_line = 0
+
+    def flush():
+        if not batch:
+            return
+        if not dry_run:
+            # параллельный импорт может занять слаг между выбором и вставкой — выбираем заново
+            for attempt in range(3):
+                try:
+                    with transaction.atomic():
+                        stats['tariffs'] += _create_batch(batch, organizer, status)
+                    break
+                except IntegrityError:
+                    if attempt == 2:
+                        raise
+        stats['created'] += len(batch)
+        stats['batches'] += 1
+        batch.clear()
+
+    rows = iter_rows(stream, fmt)
+    while True:
+        try:
+            line_no, row = next(rows)
+        except StopIteration:
+            break
+        except (ImportFormatError, UnicodeDecodeError) as e:
+            if not stats['rows']:
+                raise
+            # предыдущие пачки уже закоммичены: сообщаем, с какого места файл не обработан
+            message = (str(e) if isinstance(e, ImportFormatError)
+                       else "файл не в кодировке UTF-8 (в этой строке или ниже), дальше не обработан")
+            stats['aborted'] = (last_line + 1, message)
+            stats['error_count'] += 1
+            stats['errors'].append(stats['aborted'])
+            break
+        last_line = line_no
+        if max_rows is not None and stats['rows'] >= max_rows:
+            # остаток файла не читаем; уже проверенные строки импортируются
+            stats['error_count'] += 1
+            stats['errors'].append((line_no, f"превышен лимит {max_rows} строк, дальше файл не обработан"))
+            break
+        stats['rows'] += 1
+        try:
+            batch.append(validate(row))
+        except ValueError as e:
+            stats['error_count'] += 1
+            if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                stats['errors'].append((line_no, str(e)))
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return stats
@@ -0,0 +1,165 @@
+# events/services/series.py
+"""
+Серии повторяющихся показов (EventSeries).
+
+Шаблонное событие с тарифами + правило повторения разворачиваются в конкретные Event и EventTariff
+одной транзакцией: слаги — одним запросом (allocate_unique_slugs), события и тарифы — bulk_create,
+остаток билетов — одним UPDATE.
+
+Массовая правка применяется ко всем будущим показам серии, которые организатор может менять сам
+(черновик, на модерации, отклонено) — набором UPDATE без загрузки событий. Опубликованные показы
+меняются, как и раньше, только через заявки на правку.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from events.models import Event, EventSeries, EventTariff, allocate_unique_slugs
+from events.services.availability import recompute_available_tickets
+
+EDITABLE_STATUSES = (Event.Status.DRAFT, Event.Status.PENDING, Event.Status.REJECTED)
+# поля события, которые переносятся из шаблона в показы и меняются массовой правкой
+SERIES_FIELDS = ('title', 'category_id', 'description', 'location', 'duration_minutes', 'image', 'image_width',
+                 'image_height', 'capacity')
+BULK_EDIT_FIELDS = ('title', 'category', 'description', 'location', 'duration_minutes')
+
+
+class SeriesError(ValueError):
+    pass
+
+
+def expand_dates(start, frequency: str, interval: int = 1, weekdays=(), until=None, count=None,
+                 limit: int = None) -> list:
+    """
+    Даты показов после start по правилу повторения (сам start не входит).
+    Время начала — местное время start, поэтому переход на летнее время его не сдвигает.
+    count — общее число показов вместе с шаблоном; нужен until или count.
+    Серия больше limit показов (вместе с шаблоном) — SeriesError, а не обрезка.
+    """
+    if until is None and count is None:
+        raise SeriesError("Укажите дату окончания серии или число показов.")
+    limit = limit or settings.EVENT_SERIES_MAX_OCCURRENCES
+    if count is not None and count > limit:
+        raise SeriesError(f"В серии может быть не больше {limit} показов.")
+    # для until берём на дату больше допустимого, чтобы заметить превышение
+    remaining = count - 1 if count else limit
+    local = timezone.localtime(start)
+    first_day, at = local.date(), local.time()
+    interval = max(interval, 1)
+
+    days = []
+    if frequency == EventSeries.Frequency.DAILY:
+        day = first_day + timedelta(days=interval)
+        while len(days) < remaining and (until is None or day <= until):
+            days.append(day)
+            day += timedelta(days=interval)
+    else:
+        weekdays = sorted(set(weekdays)) or [first_day.weekday()]
+        week_start = first_day - timedelta(days=first_day.weekday())
+        while len(days) < remaining:
+            if until is not None and week_start > until:
+                break
+            for wd in weekdays:
+                day = week_start + timedelta(days=wd)
+                if day <= first_day or (until is not None and day > until):
+                    continue
+                days.append(day)
+                if len(days) >= remaining:
+                    break
+            week_start += timedelta(weeks=interval)
+
+    if len(days) > limit - 1:
+        raise SeriesError(f"В серии может быть не больше {limit} показов — "
+                          f"выберите более раннюю дату окончания.")
+    tz = timezone.get_current_timezone()
+    return [timezone.make_aware(datetime.combine(day, at), tz) for day in days]
+
+
+@transaction.atomic
+def create_series(template: Event, *, frequency: str, interval: int = 1, weekdays=(), until=None,
+                  count=None, status: str = Event.Status.DRAFT):
+    """
+    Создаёт серию из шаблонного события: шаблон становится первым показом, остальные показы
+    копируют его поля и активные тарифы (без продаж). Возвращает (серия, список созданных событий).
+    """
+    # блокировка шаблона: параллельный запрос дождётся нас и увидит уже созданную серию
+    template = Event.objects.select_for_update().get(pk=template.pk)
+    if template.series_id:
+        raise SeriesError("Событие уже входит в серию.")
+    tariffs = list(template.event_tariffs.filter(is_active=True).values_list('tariff_id', 'price',
+                                                                             'available_quantity'))
+    if status == Event.Status.PENDING and not any(q > 0 for _, _, q in tariffs):
+        raise SeriesError("Для отправки на модерацию нужен активный тариф с положительной квотой.")
+    dates = expand_dates(template.starts_at, frequency, interval, weekdays, until, count)
+    if not dates:
+        raise SeriesError("По правилу повторения не получилось ни одной даты после шаблона.")
+
+    series = EventSeries.objects.create(
+        organizer=template.organizer, template=template, frequency=frequency, interval=interval,
+        weekdays=','.join(str(d) for d in sorted(set(weekdays))), until=until, count=count,
+    )
+    Event.objects.filter(pk=template.pk).update(series=series)
+    template.series = series
+
+    fields = {name: getattr(template, name) for name in SERIES_FIELDS}
+    slugs = allocate_unique_slugs(Event, [template.title] * len(dates), max_len=140)
+    events = Event.objects.bulk_create([
+        Event(**fields, slug=slug, starts_at=starts_at, organizer_id=template.organizer_id,
+              status=status, series=series)
+        for starts_at, slug in zip(dates, slugs)
+    ])
+    EventTariff.objects.bulk_create([
+        EventTariff(event=event, tariff_id=tariff_id, price=price, available_quantity=quantity)
+        for event in events
+        for tariff_id, price, quantity in tariffs
+    ])
+    recompute_available_tickets([e.pk for e in events])
+    return series, events
+
+
+def future_occurrences(series: EventSeries):
+    return series.occurrences.filter(starts_at__gt=timezone.now())
+
+
+@transaction.atomic
+def update_future_occurrences(series: EventSeries, *, fields: dict = None, start_time=None,
+                              tariffs: dict = None) -> dict:
+    """
+    Массовая правка будущих показов серии, доступных организатору для редактирования.
+      fields    — {поле: значение} из BULK_EDIT_FIELDS;
+      start_time — новое местное время начала (datetime.time): сдвиг одинаков для всех показов;
+      tariffs   — {tariff_id: {'price': Decimal, 'quantity': int}}; квота не опускается ниже продаж.
+    Возвращает {'updated', 'skipped'} — skipped: будущие показы, которые уже опубликованы.
+    """
+    future = future_occurrences(series)
+    editable = future.filter(status__in=EDITABLE_STATUSES)
+    ids = list(editable.values_list('pk', flat=True))
+    skipped = future.exclude(status__in=EDITABLE_STATUSES).count()
+    if not ids:
+        return {'updated': 0, 'skipped': skipped}
+
+    changes = {name: value for name, value in (fields or {}).items() if name in BULK_EDIT_FIELDS}
+    if start_time is not None:
+        first = editable.order_by('starts_at').values_list('starts_at', flat=True).first()
+        local = timezone.localtime(first)
+        shift = (datetime.combine(local.date(), start_time) - datetime.combine(local.date(), local.time()))
+        if shift:
+            changes['starts_at'] = F('starts_at') + Value(shift)
+    if changes:
+        Event.objects.filter(pk__in=ids).update(**changes, updated_at=timezone.now())
+
+    if tariffs:
+        for tariff_id, values in tariffs.items():
+            update = {}
+            if values.get('price') is not None:
+                update['price'] = values['price']
+            if values.get('quantity') is not None:
+                update['available_quantity'] = Greatest(Value(values['quantity']), F('sales_count'))
+            if update:
+                EventTariff.objects.filter(event_id__in=ids, tariff_id=tariff_id).update(**update)
+        recompute_available_tickets(ids)
+    return {'updated': len(ids), 'skipped': skipped}
@@ -7,10 +7,15 @@ urlpatterns = [
     # кабинет организатора
     path('my-events/', views.my_events, name='my_events'), # список моих мероприятий
     path('my-events/create/', views.my_event_create, name='create'), # создание мероприятия
+    path('my-events/import/', views.my_events_import, name='import'), # массовая загрузка из CSV/JSON
     path('my-events/<int:pk>/edit/', views.my_event_edit, name='edit'), # редактирование мероприятия
+    path('my-events/<int:pk>/series/', views.my_event_series_create, name='series_create'), # серия показов из события
+    path('my-events/series/<int:pk>/', views.my_series_edit, name='series_edit'), # будущие показы серии, массовая правка
     path('my-events/<int:pk>/tickets/', views.my_event_tickets, name='my_event_tickets'), # управление билетами мероприятия
     path('my-events/<int:pk>/tickets/export/', views.my_event_tickets_export, name='my_event_tickets_export'), # экспорт билетов
     path('ai/generate-description/', views.generate_description_api, name='generate_description_api'), # генерация описания через YandexGPT
+    path('ai/generate-description/stream/', views.generate_description_stream, name='generate_description_stream'), # то же, потоком (SSE)
+    path('ai/stats/', views.ai_stats_api, name='ai_stats_api'), # статистика кэша AI-генерации
 
     # публичные
     path('', views.event_list, name='list'), # список мероприятий
@@ -1,23 +1,55 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q, Min, Case, When, Value, IntegerField, F
+from decimal import Decimal
+from django.db.models import (
+    Q, Min, Case, When, Value, IntegerField, F, Count, DecimalField, Exists, OuterRef, Subquery, Sum,
+)
+from django.db.models.functions import Coalesce
 from django.utils.dateparse import parse_date
 from django.shortcuts import get_object_or_404, redirect, render
-from tickets.models import Ticket
+from tickets.models import Order, OrderItem, Ticket
+from core.pagination import paginate_by_cursor
 from favorites.models import Favorite
-import csv
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from .forms import EventForm, EventTariffFormSet, EventEditRequestForm
-from .models import Category, Event, EventEditRequest
+from core.ratelimit import rate_limit
+from .forms import (
+    EventForm, EventTariffFormSet, EventEditRequestForm, EventImportForm, EventSeriesBulkEditForm, EventSeriesForm,
+)
+from .models import Category, Event, EventEditRequest, EventSeries, EventTariff, Tariff
 import json
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from .services.ai import generate_event_description, YandexGPTError
+from .services.ai import (
+    build_description_prompt, generate_event_description, get_ai_stats, stream_event_description, YandexGPTError,
+)
+from .services.export import apply_ticket_filters, iter_tickets_csv
+from .services.importer import ImportFormatError, detect_format, import_events
+from .services.series import SeriesError, create_series, future_occurrences, update_future_occurrences
+from django.conf import settings
 
 
 
+# статистика события для кабинета организатора: коррелированные подзапросы по индексам
+# (без JOIN по билетам/заказам, поэтому строки событий не размножаются)
+def _event_subquery(qs, expr):
+    return Subquery(qs.filter(event=OuterRef('pk')).order_by().values('event').annotate(v=expr).values('v'))
+
+
+MY_EVENTS_STATS = {
+    'has_pending_edit': Exists(EventEditRequest.objects.filter(event=OuterRef('pk'),
+                                                               status=EventEditRequest.Status.PENDING)),
+    'sold': Coalesce(_event_subquery(EventTariff.objects.all(), Sum('sales_count')), 0),
+    'checked_in': Coalesce(_event_subquery(Ticket.objects.filter(is_used=True), Count('pk')), 0),
+    'revenue': Coalesce(
+        _event_subquery(OrderItem.objects.filter(order__status=Order.Status.PAID),
+                        Sum(F('unit_price') * F('quantity'), output_field=DecimalField())),
+        Value(Decimal('0')), output_field=DecimalField(),
+    ),
+}
+
+
 def _require_organizer(request):
     """
     Проверяет, является ли текущий пользователь авторизованным организатором.
@@ -196,16 +228,22 @@ def event_detail(request, slug: str):
 @login_required
 # список моих мероприятий
 def my_events(request):
+    """
+    Кабинет организатора: события со статистикой одним запросом (флаг заявки на правку,
+    продано, остаток, проходы, выручка — подзапросами) и курсорная пагинация по дате начала.
+    """
     qs = (Event.objects
           .filter(organizer=request.user)
           .select_related('category')
-          .prefetch_related('edit_requests'))
+          .annotate(**MY_EVENTS_STATS))
+    page = paginate_by_cursor(qs, request.GET.get('cursor'), settings.MY_EVENTS_PER_PAGE, field='starts_at')
 
-    # добавляем флаг наличия активной заявки
-    for e in qs:
-        e.has_pending_edit = e.edit_requests.filter(status='pending').exists()
+    totals = EventTariff.objects.filter(event__organizer=request.user).aggregate(sold=Sum('sales_count'))
+    totals['revenue'] = OrderItem.objects.filter(
+        event__organizer=request.user, order__status=Order.Status.PAID,
+    ).aggregate(revenue=Sum(F('unit_price') * F('quantity'), output_field=DecimalField()))['revenue']
 
-    return render(request, "events/my_events.html", {"events": qs})
+    return render(request, "events/my_events.html", {"events": page, "page": page, "totals": totals})
 
 
 @login_required
@@ -258,6 +296,108 @@ def my_event_create(request):
         "is_edit": False,
     })
 
+@login_required
+def my_events_import(request):
+    """
+    Массовая загрузка мероприятий организатора из CSV/JSON (см. events.services.importer).
+    Файл читается потоком, ошибочные строки пропускаются и показываются в отчёте.
+    """
+    if not _require_organizer(request):
+        return redirect("users:profile")
+
+    report = None
+    if request.method == "POST":
+        form = EventImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            status = (Event.Status.PENDING if form.cleaned_data["submit_for_moderation"]
+                      else Event.Status.DRAFT)
+            try:
+                report = import_events(upload, detect_format(upload.name), request.user, status=status,
+                                       max_rows=settings.EVENT_IMPORT_MAX_ROWS,
+                                       dry_run=form.cleaned_data["dry_run"])
+            except (ImportFormatError, UnicodeDecodeError) as e:
+                form.add_error("file", str(e) if isinstance(e, ImportFormatError)
+                               else "Файл должен быть в кодировке UTF-8.")
+            else:
+                if form.cleaned_data["dry_run"]:
+                    messages.info(request, f"Проверка: можно создать {report['created']} из {report['rows']}.")
+                elif report["created"]:
+                    messages.success(request, f"Создано мероприятий: {report['created']}.")
+                if report["aborted"]:
+                    line_no, message = report["aborted"]
+                    messages.error(request, f"Файл обработан не полностью: строка {line_no} — {message}. "
+                                            f"Строки выше уже обработаны, загрузите остаток файла отдельно.")
+                if not report["error_count"] and not form.cleaned_data["dry_run"]:
+                    return redirect("events:my_events")
+    else:
+        form = EventImportForm()
+
+    return render(request, "events/import.html", {"form": form, "report": report})
+
+
+@login_required
+def my_event_series_create(request, pk: int):
+    """
+    Серия повторяющихся показов из события организатора: поля и тарифы копируются
+    на каждую дату правила повторения (см. events.services.series).
+    """
+    template = get_object_or_404(Event, pk=pk, organizer=request.user)
+    if template.series_id:
+        return redirect("events:series_edit", pk=template.series_id)
+
+    if request.method == "POST":
+        form = EventSeriesForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            status = Event.Status.PENDING if data["submit_for_moderation"] else Event.Status.DRAFT
+            try:
+                series, events = create_series(
+                    template, frequency=data["frequency"], interval=data["interval"],
+                    weekdays=data["weekdays"], until=data["until"], count=data["count"], status=status,
+                )
+            except SeriesError as e:
+                form.add_error(None, str(e))
+            else:
+                messages.success(request, f"Серия создана: добавлено показов — {len(events)}.")
+                return redirect("events:series_edit", pk=series.pk)
+    else:
+        form = EventSeriesForm()
+
+    return render(request, "events/series_form.html", {"form": form, "event": template})
+
+
+@login_required
+def my_series_edit(request, pk: int):
+    """Будущие показы серии и массовая правка всех редактируемых из них."""
+    series = get_object_or_404(EventSeries.objects.select_related("template"), pk=pk, organizer=request.user)
+    tariffs = Tariff.objects.filter(event_tariffs__event__series=series).distinct()
+
+    if request.method == "POST":
+        form = EventSeriesBulkEditForm(request.POST, tariffs=tariffs)
+        if form.is_valid():
+            result = update_future_occurrences(
+                series, fields=form.changed_fields(), start_time=form.cleaned_data["start_time"],
+                tariffs=form.tariff_changes(),
+            )
+            msg = f"Обновлено будущих показов: {result['updated']}."
+            if result["skipped"]:
+                msg += (f" Опубликованные показы ({result['skipped']}) не изменены — "
+                        f"для них отправьте заявку на правку.")
+            messages.success(request, msg)
+            return redirect("events:series_edit", pk=series.pk)
+    else:
+        form = EventSeriesBulkEditForm(tariffs=tariffs)
+
+    occurrences = future_occurrences(series).order_by("starts_at").only("pk", "title", "starts_at", "status",
+                                                                       "available_tickets")
+    return render(request, "events/series_edit.html", {
+        "series": series,
+        "form": form,
+        "occurrences": occurrences,
+    })
+
+
 @login_required
 def my_event_edit(request, pk: int):
     """
@@ -335,68 +475,50 @@ def my_event_tickets(request, pk: int):
     if not _require_organizer(request):
         return redirect("users:profile")
     event = get_object_or_404(Event, pk=pk, organizer=request.user)
-    tickets = (Ticket.objects
+    tickets = apply_ticket_filters(Ticket.objects.filter(event=event), request.GET)
+    tickets = (tickets
                .select_related('user', 'event_tariff', 'event_tariff__tariff')
-               .filter(event=event)
-               .order_by('-created_at'))
-    return render(request, 'events/my_event_tickets.html', {'event': event, 'tickets': tickets})
+               .order_by('-created_at', '-id'))
+
+    # Пагинация (индекс event+created_at отдаёт страницу без сортировки всех билетов)
+    paginator = Paginator(tickets, 50)
+    page = request.GET.get('page')
+    tickets_page = paginator.get_page(page)
+
+    # Базовая строка запроса без page: для ссылок пагинации и экспорта с теми же фильтрами
+    params = request.GET.copy()
+    params.pop('page', None)
+    base_qs = params.urlencode()
+
+    tariffs = event.event_tariffs.select_related('tariff')
+    return render(request, 'events/my_event_tickets.html', {
+        'event': event,
+        'tickets': tickets_page,
+        'tariffs': tariffs,
+        'filters': request.GET,
+        'base_qs': base_qs,
+    })
 
 
 @login_required
 def my_event_tickets_export(request, pk: int):
-    #Экспорт списка проданных билетов в формате CSV
+    #Экспорт списка проданных билетов в формате CSV (потоково, с фильтрами tariff/used/date_from/date_to)
     if not _require_organizer(request):
       return redirect("users:profile")
 
     event = get_object_or_404(Event, pk=pk, organizer=request.user)
-    tickets = (Ticket.objects
-               .select_related('user', 'event_tariff', 'event_tariff__tariff')
-               .filter(event=event)
-               .order_by('id'))
-
-    # CSV с BOM, чтобы Excel на Windows корректно читал кириллицу
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response = StreamingHttpResponse(iter_tickets_csv(event, request.GET),
+                                     content_type='text/csv; charset=utf-8')
     filename = f"tickets-event-{event.id}.csv"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    response.write('\ufeff')  # BOM
-
-    writer = csv.writer(response, delimiter=';')
-    writer.writerow([
-        'ID билета', 'Покупатель', 'Email',
-        'Тариф', 'Цена', 'Использован',
-        'Дата покупки', 'QR-хэш'
-    ])
-    for t in tickets:
-        buyer = t.user.get_full_name() or t.user.username
-        email = t.user.email
-        tariff = t.event_tariff.tariff.name
-        price = str(t.event_tariff.price)
-        used = 'Да' if t.is_used else 'Нет'
-        created = timezone.localtime(t.created_at).strftime('%d.%m.%Y %H:%M')
-        writer.writerow([t.id, buyer, email, tariff, price, used, created, t.qr_hash])
-
     return response
 
-@login_required
-@require_POST
-def generate_description_api(request):
-    #API-эндпоинт для генерации описания мероприятия с помощью AI (YandexGPT).
-    # Разрешим только организаторам и админам
-    user = request.user
-    if not (getattr(user, "is_organizer", False) or user.is_staff or user.is_superuser):
-        return JsonResponse({"error": "Недостаточно прав"}, status=403)
-
-    # Простая защита от частых запросов (5 сек)
-    last_ts = request.session.get("ai_last_call_ts")
-    now_ts = timezone.now().timestamp()
-    if last_ts and now_ts - last_ts < 5:
-        return JsonResponse({"error": "Слишком часто. Попробуйте через пару секунд."}, status=429)
-    request.session["ai_last_call_ts"] = now_ts
-
+def _description_prompt(raw_body: bytes):
+    """Промпт для AI-описания из JSON формы события. Возвращает (prompt, None) или (None, текст ошибки)."""
     try:
-        body = json.loads(request.body.decode("utf-8"))
-    except json.JSONDecodeError:
-        return JsonResponse({"error": "Неверный JSON"}, status=400)
+        body = json.loads(raw_body.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None, "Неверный JSON"
 
     # Собираем контекст: можно передать title/date/location/category/keywords
     title = (body.get("title") or "").strip()
@@ -406,19 +528,72 @@ def generate_description_api(request):
     keywords = (body.get("keywords") or "").strip()
 
     if not (title or keywords):
-        return JsonResponse({"error": "Укажите как минимум название или ключевые слова"}, status=400)
-
-    # Сформируем user‑промпт из полей формы
-    parts = []
-    if title: parts.append(f"Название: {title}")
-    if category: parts.append(f"Категория: {category}")
-    if date_time: parts.append(f"Дата и время: {date_time}")
-    if location: parts.append(f"Локация: {location}")
-    if keywords: parts.append(f"Ключевые слова: {keywords}")
-    prompt = "Создай привлекательное описание мероприятия по данным:\n" + "\n".join(parts)
+        return None, "Укажите как минимум название или ключевые слова"
+
+    return build_description_prompt(title=title, category=category, starts_at=date_time,
+                                    location=location, keywords=keywords), None
+
+
+def _sse(data: dict, event: str = None) -> str:
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@login_required
+@require_POST
+@rate_limit('ai_generate')
+async def generate_description_stream(request):
+    """
+    Потоковая генерация описания (Server-Sent Events): фрагменты текста по мере генерации.
+    Асинхронная вьюха — под ASGI (config/asgi.py) ожидание провайдера не занимает воркер.
+    События: data {"text": фрагмент}, затем event: done или event: error.
+    """
+    user = await request.auser()
+    if not (getattr(user, "is_organizer", False) or user.is_staff or user.is_superuser):
+        return JsonResponse({"error": "Недостаточно прав"}, status=403)
+
+    prompt, error = _description_prompt(request.body)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+
+    async def events():
+        try:
+            async for delta in stream_event_description(prompt):
+                yield _sse({"text": delta})
+        except YandexGPTError as e:
+            yield _sse({"error": str(e)}, event="error")
+            return
+        yield _sse({}, event="done")
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream; charset=utf-8")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: не буферизовать поток
+    return response
+
+
+@login_required
+@require_POST
+@rate_limit('ai_generate')
+def generate_description_api(request):
+    #API-эндпоинт для генерации описания мероприятия с помощью AI (YandexGPT).
+    # Разрешим только организаторам и админам
+    user = request.user
+    if not (getattr(user, "is_organizer", False) or user.is_staff or user.is_superuser):
+        return JsonResponse({"error": "Недостаточно прав"}, status=403)
+
+    prompt, error = _description_prompt(request.body)
+    if error:
+        return JsonResponse({"error": error}, status=400)
     # Вызов сервиса AI
     try:
         text = generate_event_description(prompt)
         return JsonResponse({"text": text})
     except YandexGPTError as e:
-        return JsonResponse({"error": str(e)}, status=503)
\ No newline at end of file
+        return JsonResponse({"error": str(e)}, status=503)
+
+
+@login_required
+def ai_stats_api(request):
+    # Статистика кэша AI-генерации (доля попаданий, задержки провайдера) — только для админов
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({"error": "Недостаточно прав"}, status=403)
+    return JsonResponse(get_ai_stats())
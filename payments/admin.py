@@ -1,8 +1,45 @@
 from django.contrib import admin
-from .models import PaymentTransaction
+from django.db.models import Q
+from core.admin import LargeTableAdminMixin
+from .models import PaymentTransaction, WebhookInbox
 
 @admin.register(PaymentTransaction)
-class PaymentTransactionAdmin(admin.ModelAdmin):
+class PaymentTransactionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('payment_id', 'provider', 'status', 'order', 'amount', 'created_at')
+    list_select_related = ('order',)
     search_fields = ('payment_id', 'order__id')
-    list_filter = ('status', 'provider', 'created_at')
\ No newline at end of file
+    search_help_text = "ID платежа у провайдера или номер заказа (точное совпадение)"
+    list_filter = ('status', 'provider', 'created_at')
+    raw_id_fields = ('order',)
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        # payload (ответ провайдера) в списке не показывается — не тянем его на каждую строку
+        match = request.resolver_match
+        if match and match.url_name.endswith('_changelist'):
+            qs = qs.defer('payload')
+        return qs
+
+    def get_search_results(self, request, queryset, search_term):
+        # точное совпадение: ID платежа — по уникальному индексу, номер заказа — по индексу FK
+        # (icontains по payment_id и order_id::text читал бы всю таблицу)
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        cond = Q(payment_id=term)
+        if term.isascii() and term.isdigit():
+            cond |= Q(order_id=int(term))
+        return queryset.filter(cond), False
+
+@admin.register(WebhookInbox)
+class WebhookInboxAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('payment_id', 'event', 'status', 'attempts', 'received_at', 'processed_at')
+    search_fields = ('payment_id',)
+    list_filter = ('status', 'event')
+    readonly_fields = ('received_at', 'processed_at')
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return queryset.filter(payment_id=term), False
@@ -0,0 +1,182 @@
+# payments/gateway.py
+"""
+HTTP-клиент ЮKassa вместо глобально конфигурируемого SDK:
+  - одна пуловая requests.Session на процесс (keep-alive, без TLS-рукопожатия на каждый вызов);
+  - ограниченные таймауты (connect/read);
+  - повторы с экспоненциальной задержкой и джиттером только для идемпотентных вызовов
+    (GET и POST с заголовком Idempotence-Key);
+  - circuit breaker: после серии сбоев запросы к провайдеру не отправляются reset_timeout секунд.
+Ответы заворачиваются в PaymentResponse из SDK, поэтому вызывающий код не меняется.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from yookassa.domain.response import PaymentResponse
+
+logger = logging.getLogger('payments')
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PaymentGatewayError(Exception):
+    """Ошибка обращения к платёжному провайдеру."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class PaymentGatewayUnavailable(PaymentGatewayError):
+    """Провайдер недоступен: circuit breaker разомкнут."""
+
+
+class CircuitBreaker:
+    """
+    Простой breaker: closed -> (threshold сбоев подряд) -> open -> (reset_timeout) -> half-open.
+    В half-open пропускается один пробный запрос: успех замыкает цепь, сбой снова размыкает.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning("YooKassa circuit breaker opened after %s failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class YooKassaClient:
+    def __init__(self, *, base_url, shop_id, secret_key, connect_timeout, read_timeout,
+                 max_retries, backoff, breaker: CircuitBreaker, pool_size: int = 10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker
+
+        self.session = requests.Session()
+        self.session.auth = (shop_id, secret_key)
+        self.session.headers.update({'Content-Type': 'application/json'})
+        # повторы делаем сами (с учётом идемпотентности), адаптер только держит пул соединений
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    # --- API ---
+    def create_payment(self, data: dict, idempotence_key: str) -> PaymentResponse:
+        # POST с Idempotence-Key безопасно повторять: провайдер вернёт тот же платёж
+        return PaymentResponse(self._request('POST', '/payments', json=data,
+                                             headers={'Idempotence-Key': idempotence_key}))
+
+    def get_payment(self, payment_id: str) -> PaymentResponse:
+        return PaymentResponse(self._request('GET', f'/payments/{payment_id}'))
+
+    def cancel_payment(self, payment_id: str, idempotence_key: str) -> PaymentResponse:
+        # отменить можно только платёж в статусе waiting_for_capture
+        return PaymentResponse(self._request('POST', f'/payments/{payment_id}/cancel', json={},
+                                             headers={'Idempotence-Key': idempotence_key}))
+
+    # --- транспорт ---
+    def _sleep_before_retry(self, attempt: int):
+        # full jitter: случайная пауза в [0; backoff * 2^attempt]
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def _request(self, method, path, **kwargs) -> dict:
+        if not self.breaker.allow():
+            raise PaymentGatewayUnavailable("YooKassa is temporarily unavailable (circuit open)")
+
+        url = self.base_url + path
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._sleep_before_retry(attempt - 1)
+            try:
+                resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.RequestException as e:
+                last_error = PaymentGatewayError(f"Network error: {e}")
+                continue
+
+            if resp.status_code in RETRY_STATUSES:
+                last_error = PaymentGatewayError(f"API error {resp.status_code}", resp.status_code)
+                continue
+
+            if resp.status_code != 200:
+                # 4xx — ошибка запроса, провайдер при этом жив: повторять бессмысленно
+                self.breaker.record_success()
+                try:
+                    err = resp.json()
+                except ValueError:
+                    err = resp.text
+                raise PaymentGatewayError(f"API error {resp.status_code}: {err}", resp.status_code)
+
+            self.breaker.record_success()
+            return resp.json()
+
+        self.breaker.record_failure()
+        raise last_error
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> YooKassaClient:
+    """Клиент ЮKassa процесса (пересоздаётся после fork, чтобы не делить сокеты пула)."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = YooKassaClient(
+                    base_url=settings.YOO_KASSA_API_URL,
+                    shop_id=settings.YOO_KASSA_SHOP_ID,
+                    secret_key=settings.YOO_KASSA_SECRET_KEY,
+                    connect_timeout=settings.YOO_KASSA_CONNECT_TIMEOUT,
+                    read_timeout=settings.YOO_KASSA_READ_TIMEOUT,
+                    max_retries=settings.YOO_KASSA_MAX_RETRIES,
+                    backoff=settings.YOO_KASSA_RETRY_BACKOFF,
+                    breaker=CircuitBreaker(settings.YOO_KASSA_BREAKER_THRESHOLD,
+                                           settings.YOO_KASSA_BREAKER_RESET),
+                    pool_size=settings.YOO_KASSA_POOL_SIZE,
+                )
+                _client_pid = pid
+    return _client
@@ -0,0 +1,25 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments.services import archive_payment_payloads
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит сырые payload PaymentTransaction старше PAYMENT_PAYLOAD_HOT_DAYS (или --older-than-days) "
+        "в сжатый архив PaymentPayloadArchive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **opts):
+        days = opts['older_than_days'] if opts['older_than_days'] is not None else settings.PAYMENT_PAYLOAD_HOT_DAYS
+        started = time.perf_counter()
+        count = archive_payment_payloads(timezone.now() - timedelta(days=days), batch_size=opts['batch_size'])
+        self.stdout.write(f"Перенесено в архив: {count} за {time.perf_counter() - started:.1f} с")
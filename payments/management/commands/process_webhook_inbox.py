@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.services import process_webhook_inbox
+
+
+class Command(BaseCommand):
+    help = "Обрабатывает уведомления ЮKassa из WebhookInbox (однократно или в цикле)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, опрашивая очередь')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Пауза при пустой очереди, сек')
+
+    def handle(self, *args, **opts):
+        while True:
+            count = process_webhook_inbox(batch_size=opts['batch_size'])
+            if count:
+                self.stdout.write(f"Обработано уведомлений: {count}")
+            if not opts['loop']:
+                break
+            if count < opts['batch_size']:
+                time.sleep(opts['sleep'])
@@ -0,0 +1,129 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments.models import PaymentTransaction
+from payments.services import cancel_yk_payment, finalize_pending_order, get_yk_payment
+from tickets.models import Order
+
+LOCK_KEY = 'payments:reconcile:lock'
+PENDING_STATUSES = ('pending', 'waiting_for_capture')
+
+
+def _check(payment_id):
+    # выполняется в потоке пула: только HTTP, без обращений к БД
+    try:
+        return payment_id, get_yk_payment(payment_id).status, None
+    except Exception as e:
+        return payment_id, None, e
+
+
+def _cancel(payment_id):
+    # в потоке пула: отмена у провайдера, чтобы брошенный заказ нельзя было оплатить после отмены
+    try:
+        return payment_id, cancel_yk_payment(payment_id).status, None
+    except Exception as e:
+        return payment_id, None, e
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверка зависших платежей: проверяет у ЮKassa PaymentTransaction в статусе pending старше N минут "
+        "(пулом потоков), финализирует успешные и отменяет брошенные заказы пачкой. Брошенный заказ "
+        "отменяется, только когда платёж отменён у провайдера: waiting_for_capture отменяем сами, "
+        "pending пропускаем до истечения платежа у ЮKassa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=15, help='Минимальный возраст платежа, мин')
+        parser.add_argument('--abandon-after', type=int, default=24 * 60,
+                            help='Через сколько минут всё ещё pending-заказ считается брошенным')
+        parser.add_argument('--workers', type=int, default=8, help='Параллельных запросов к провайдеру')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=5000, help='Максимум платежей за проход')
+        parser.add_argument('--loop', action='store_true', help='Запускать проходы по расписанию')
+        parser.add_argument('--interval', type=int, default=300, help='Пауза между проходами, сек')
+
+    def handle(self, *args, **opts):
+        while True:
+            # один сверщик на все процессы (нужен общий кэш)
+            if cache.add(LOCK_KEY, 1, timeout=opts['interval'] + 600):
+                try:
+                    self._run(opts)
+                finally:
+                    cache.delete(LOCK_KEY)
+            else:
+                self.stdout.write("Сверка уже выполняется другим процессом — пропускаем.")
+            if not opts['loop']:
+                break
+            time.sleep(opts['interval'])
+
+    def _run(self, opts):
+        started = time.perf_counter()
+        now = timezone.now()
+        candidates = list(
+            PaymentTransaction.objects
+            .filter(status__in=PENDING_STATUSES,
+                    order__status=Order.Status.PENDING,
+                    created_at__lt=now - timedelta(minutes=opts['older_than']))
+            .order_by('created_at')
+            .values_list('payment_id', 'order_id', 'created_at')[:opts['limit']]
+        )
+        abandon_before = now - timedelta(minutes=opts['abandon_after'])
+        stats = {'checked': 0, 'finalized': 0, 'busy': 0, 'canceled': 0, 'skipped': 0, 'errors': 0}
+
+        with ThreadPoolExecutor(max_workers=opts['workers']) as pool:
+            for i in range(0, len(candidates), opts['batch_size']):
+                batch = candidates[i:i + opts['batch_size']]
+                meta = {pid: (order_id, created_at) for pid, order_id, created_at in batch}
+                by_status = {}
+                for pid, status, error in pool.map(_check, meta):
+                    stats['checked'] += 1
+                    if error is not None:
+                        stats['errors'] += 1
+                        continue
+                    by_status.setdefault(status, []).append(pid)
+
+                # брошенные: у провайдера платёж ещё можно завершить, поэтому сначала отменяем его там
+                abandoned = [pid for pid in by_status.get('waiting_for_capture', []) if meta[pid][1] < abandon_before]
+                for pid, status, error in pool.map(_cancel, abandoned):
+                    if error is not None:
+                        stats['errors'] += 1
+                        continue
+                    by_status['waiting_for_capture'].remove(pid)
+                    by_status.setdefault(status, []).append(pid)
+                # pending отменить у провайдера нельзя: ждём, пока ЮKassa сама отменит платёж
+                stats['skipped'] += sum(1 for pid in by_status.get('pending', []) if meta[pid][1] < abandon_before)
+                self._apply(by_status, meta, stats)
+
+        elapsed = time.perf_counter() - started
+        rate = stats['checked'] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Проверено: {stats['checked']} за {elapsed:.1f} с ({rate:.1f}/с); финализировано: {stats['finalized']}, "
+            f"занято вебхуком: {stats['busy']}, отменено: {stats['canceled']}, "
+            f"брошенных, но ещё pending у провайдера: {stats['skipped']}, ошибок провайдера: {stats['errors']}"
+        )
+
+    def _apply(self, by_status, meta, stats):
+        # статусы транзакций — одним UPDATE на статус
+        for status, pids in by_status.items():
+            PaymentTransaction.objects.filter(payment_id__in=pids).exclude(status=status).update(status=status)
+
+        # успешные: финализация по заказу; SKIP LOCKED — не ждём заказ, который сейчас обрабатывает вебхук
+        for pid in by_status.get('succeeded', []):
+            result = finalize_pending_order(meta[pid][0], skip_locked=True)
+            if result == Order.Status.PAID:
+                stats['finalized'] += 1
+            elif result is None:
+                stats['busy'] += 1
+
+        # отменённые у провайдера (в том числе брошенные, отменённые выше) — одним UPDATE
+        cancel_ids = {meta[pid][0] for pid in by_status.get('canceled', [])}
+        if cancel_ids:
+            stats['canceled'] += Order.objects.filter(id__in=cancel_ids, status=Order.Status.PENDING).update(
+                status=Order.Status.CANCELED, canceled_at=timezone.now()
+            )
@@ -0,0 +1,156 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+PAYMENT_RE = re.compile(r'^/v3/payments/(?P<id>[\w-]+)$')
+CONFIRM_RE = re.compile(r'^/confirm/(?P<id>[\w-]+)$')
+
+
+class StubState:
+    """Платежи заглушки в памяти + учёт Idempotence-Key, как у настоящей ЮKassa."""
+
+    def __init__(self):
+        self.payments = {}
+        self.by_key = {}
+        self.lock = threading.Lock()
+
+
+def _make_handler(state: StubState, opts: dict, public_url: str):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, чтобы пул клиента работал как с провайдером
+
+        def log_message(self, fmt, *args):
+            if opts['verbosity'] > 1:
+                super().log_message(fmt, *args)
+
+        # --- helpers ---
+        def _delay_or_fail(self) -> bool:
+            latency = max(opts['latency_ms'] + random.uniform(-opts['jitter_ms'], opts['jitter_ms']), 0)
+            time.sleep(latency / 1000)
+            if random.random() < opts['error_rate']:
+                self._json(503, {'type': 'error', 'code': 'internal_server_error'})
+                return True
+            return False
+
+        def _json(self, status, data):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        # --- API ---
+        def do_POST(self):
+            if self.path != '/v3/payments':
+                return self._json(404, {'type': 'error', 'code': 'not_found'})
+            data = self._read_json()
+            if self._delay_or_fail():
+                return
+            key = self.headers.get('Idempotence-Key', '')
+            with state.lock:
+                if key and key in state.by_key:
+                    return self._json(200, state.payments[state.by_key[key]])
+                payment_id = str(uuid.uuid4())
+                amount = data.get('amount') or {}
+                payment = {
+                    'id': payment_id,
+                    'status': 'pending',
+                    'paid': False,
+                    'test': True,
+                    'amount': {'value': str(Decimal(amount.get('value') or '0')), 'currency': amount.get('currency', 'RUB')},
+                    'description': data.get('description', ''),
+                    'metadata': data.get('metadata') or {},
+                    'created_at': timezone.now().isoformat(),
+                    'confirmation': {
+                        'type': 'redirect',
+                        'return_url': (data.get('confirmation') or {}).get('return_url', ''),
+                        'confirmation_url': f'{public_url}/confirm/{payment_id}',
+                    },
+                }
+                state.payments[payment_id] = payment
+                if key:
+                    state.by_key[key] = payment_id
+            self._json(200, payment)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            m = PAYMENT_RE.match(path)
+            if m:
+                if self._delay_or_fail():
+                    return
+                payment = state.payments.get(m.group('id'))
+                if payment is None:
+                    return self._json(404, {'type': 'error', 'code': 'not_found'})
+                return self._json(200, payment)
+
+            # «Страница оплаты»: платёж сразу успешен, шлём вебхук и возвращаем покупателя на сайт
+            m = CONFIRM_RE.match(path)
+            if m and m.group('id') in state.payments:
+                with state.lock:
+                    payment = state.payments[m.group('id')]
+                    payment.update(status='succeeded', paid=True)
+                if opts['webhook_url']:
+                    threading.Thread(target=_send_webhook, args=(opts['webhook_url'], payment), daemon=True).start()
+                self.send_response(302)
+                self.send_header('Location', payment['confirmation']['return_url'] or '/')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self._json(404, {'type': 'error', 'code': 'not_found'})
+
+    return Handler
+
+
+def _send_webhook(url: str, payment: dict):
+    try:
+        requests.post(url, json={'type': 'notification', 'event': 'payment.succeeded', 'object': payment},
+                      timeout=5)
+    except requests.RequestException:
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Локальная заглушка API ЮKassa (POST/GET /v3/payments, страница /confirm/<id>) с настраиваемой "
+        "задержкой и долей ошибок — для нагрузочных тестов и CI без сети. "
+        "Запустите и укажите YOO_KASSA_API_URL=http://<host>:<port>/v3."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8010)
+        parser.add_argument('--latency-ms', type=float, default=150, help='Средняя задержка ответа API')
+        parser.add_argument('--jitter-ms', type=float, default=50)
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503 (0..1)')
+        parser.add_argument('--webhook-url', default=None,
+                            help='Куда слать payment.succeeded (по умолчанию YOO_KASSA_WEBHOOK_URL)')
+
+    def handle(self, *args, **opts):
+        if opts['webhook_url'] is None:
+            opts['webhook_url'] = settings.YOO_KASSA_WEBHOOK_URL
+        public_url = f"http://{opts['host']}:{opts['port']}"
+        server = ThreadingHTTPServer((opts['host'], opts['port']), _make_handler(StubState(), opts, public_url))
+        self.stdout.write(f"YooKassa stub: {public_url}/v3 (latency {opts['latency_ms']}±{opts['jitter_ms']} ms, "
+                          f"errors {opts['error_rate']:.0%})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(default='yookassa', max_length=20)),
+                ('payment_id', models.CharField(max_length=64)),
+                ('event', models.CharField(blank=True, max_length=64)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('new', 'Новое'), ('done', 'Обработано'), ('failed', 'Ошибка')], default='new', max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['received_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'new')), fields=['received_at'], name='webhook_inbox_new_idx')],
+                'constraints': [models.UniqueConstraint(fields=('payment_id', 'event'), name='uniq_webhook_payment_event')],
+            },
+        ),
+    ]
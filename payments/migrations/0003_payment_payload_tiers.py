@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:29
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_confirmation_url(apps, schema_editor):
+    # confirmation_url нужен только ещё не оплаченным платежам — остальные не трогаем
+    PaymentTransaction = apps.get_model('payments', 'PaymentTransaction')
+    for tx in PaymentTransaction.objects.filter(status='pending').only('pk', 'payload').iterator(chunk_size=500):
+        try:
+            payload = json.loads(tx.payload) if isinstance(tx.payload, str) else tx.payload
+            url = (payload.get('confirmation') or {}).get('confirmation_url') or ''
+        except (ValueError, AttributeError):
+            continue
+        if url:
+            PaymentTransaction.objects.filter(pk=tx.pk).update(confirmation_url=url[:512])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_webhookinbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentPayloadArchive',
+            fields=[
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload_archive', serialize=False, to='payments.paymenttransaction')),
+                ('data', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='paymenttransaction',
+            name='confirmation_url',
+            field=models.CharField(blank=True, max_length=512),
+        ),
+        migrations.AddField(
+            model_name='paymenttransaction',
+            name='payload_archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_confirmation_url, migrations.RunPython.noop),
+    ]
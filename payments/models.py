@@ -7,7 +7,11 @@ class PaymentTransaction(models.Model):
     status = models.CharField(max_length=32, db_index=True)  # pending/succeeded/canceled/...
     event = models.CharField(max_length=64, blank=True)      # имя события вебхука, если есть
     amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # «горячие» поля ответа провайдера — читаются без разбора payload
+    confirmation_url = models.CharField(max_length=512, blank=True)
+    # сырой ответ провайдера; через PAYMENT_PAYLOAD_HOT_DAYS сжимается в PaymentPayloadArchive
     payload = models.JSONField(default=dict, blank=True)
+    payload_archived_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -15,4 +19,51 @@ class PaymentTransaction(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f'{self.provider}:{self.payment_id} -> {self.status}'
\ No newline at end of file
+        return f'{self.provider}:{self.payment_id} -> {self.status}'
+
+
+class PaymentPayloadArchive(models.Model):
+    """Холодное хранилище сырых payload: JSON, сжатый zlib (см. archive_payment_payloads)."""
+    transaction = models.OneToOneField(PaymentTransaction, on_delete=models.CASCADE,
+                                       primary_key=True, related_name='payload_archive')
+    data = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'archive:{self.transaction_id}'
+
+
+class WebhookInbox(models.Model):
+    """
+    Входящие уведомления ЮKassa. Вебхук только сохраняет сырой payload и сразу отвечает 200,
+    обработка (PaymentTransaction + финализация заказа) идёт в воркере process_webhook_inbox.
+    Повторы уведомления (payment_id, event) отбрасываются уникальным ограничением.
+    """
+    class Status(models.TextChoices):
+        NEW = 'new', 'Новое'
+        DONE = 'done', 'Обработано'
+        FAILED = 'failed', 'Ошибка'
+
+    provider = models.CharField(max_length=20, default='yookassa')
+    payment_id = models.CharField(max_length=64)
+    event = models.CharField(max_length=64, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.NEW)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['received_at']
+        constraints = [
+            models.UniqueConstraint(fields=['payment_id', 'event'], name='uniq_webhook_payment_event'),
+        ]
+        indexes = [
+            # очередь воркера: только необработанные записи
+            models.Index(fields=['received_at'], name='webhook_inbox_new_idx',
+                         condition=models.Q(status='new')),
+        ]
+
+    def __str__(self):
+        return f'{self.provider}:{self.payment_id} {self.event} ({self.get_status_display()})'
@@ -1,23 +1,27 @@
+import json
+import logging
 import uuid
+import zlib
 from decimal import Decimal
 from django.conf import settings
-from yookassa import Configuration, Payment
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
 
-def _yk_configure():
-    # SDK конфигурируется глобально
-    Configuration.account_id = settings.YOO_KASSA_SHOP_ID
-    Configuration.secret_key = settings.YOO_KASSA_SECRET_KEY
+from .gateway import get_client
 
-def create_yk_payment(order, *, return_url: str):
+logger = logging.getLogger('payments')
+
+
+def create_yk_payment(order, *, return_url: str, idempotence_key: str = None):
     """
     Создаёт платеж в ЮKassa и возвращает payment object.
+    Повтор с тем же idempotence_key вернёт у провайдера тот же платёж.
     """
-    _yk_configure()
-
     amount = Decimal(order.total_price or 0).quantize(Decimal('0.01'))
-    idempotence_key = str(uuid.uuid4())
+    idempotence_key = idempotence_key or str(uuid.uuid4())
 
-    payment = Payment.create({
+    payment = get_client().create_payment({
         "amount": {
             "value": str(amount),   # '123.45'
             "currency": "RUB"
@@ -38,5 +42,230 @@ def create_yk_payment(order, *, return_url: str):
     return payment
 
 def get_yk_payment(payment_id: str):
-    _yk_configure()
-    return Payment.find_one(payment_id)
\ No newline at end of file
+    return get_client().get_payment(payment_id)
+
+
+def cancel_yk_payment(payment_id: str):
+    """Отменяет у провайдера платёж в статусе waiting_for_capture. Повтор безопасен: ключ по платежу."""
+    return get_client().cancel_payment(payment_id, f'cancel-{payment_id}')
+
+
+def get_cached_payment_status(payment_id: str):
+    """
+    Статус платежа у провайдера с коротким кэшем (YOO_KASSA_STATUS_CACHE_TTL):
+    обновления страницы и long-poll не превращаются в поток запросов к ЮKassa.
+    Возвращает None, если провайдер недоступен.
+    """
+    key = f'yk:payment-status:{payment_id}'
+    status = cache.get(key)
+    if status is None:
+        try:
+            status = get_yk_payment(payment_id).status or ''
+        except Exception as e:
+            logger.warning("YooKassa status check failed for %s: %s", payment_id, e)
+            return None
+        cache.set(key, status, settings.YOO_KASSA_STATUS_CACHE_TTL)
+    return status
+
+
+def get_confirmation_url(tx):
+    """Ссылка на оплату из «горячей» колонки; payload разбираем только у старых записей без неё."""
+    if tx.confirmation_url:
+        return tx.confirmation_url
+    if 'payload' in tx.get_deferred_fields():
+        return None
+    # payload может храниться строкой (payment.json()) или словарём (вебхук)
+    try:
+        payload = json.loads(tx.payload) if isinstance(tx.payload, str) else tx.payload
+        return payload.get('confirmation', {}).get('confirmation_url')
+    except Exception:
+        return None
+
+
+def get_payment_payload(tx) -> dict:
+    """Сырой payload транзакции: из строки или, если он уже в архиве, распакованный из PaymentPayloadArchive."""
+    from .models import PaymentPayloadArchive
+
+    if tx.payload_archived_at is None or tx.payload:
+        return json.loads(tx.payload) if isinstance(tx.payload, str) else tx.payload
+    archive = PaymentPayloadArchive.objects.filter(transaction_id=tx.pk).only('data').first()
+    return json.loads(zlib.decompress(bytes(archive.data))) if archive else {}
+
+
+def archive_payment_payloads(older_than, batch_size: int = 500) -> int:
+    """
+    Переносит payload транзакций, не обновлявшихся с older_than, в PaymentPayloadArchive
+    (JSON, сжатый zlib) и очищает колонку в PaymentTransaction. Пачка — один INSERT и один UPDATE.
+    Возвращает число перенесённых записей.
+    """
+    from .models import PaymentPayloadArchive, PaymentTransaction
+
+    archived = 0
+    last_pk = 0
+    while True:
+        batch = list(PaymentTransaction.objects
+                     .filter(payload_archived_at__isnull=True, updated_at__lt=older_than, pk__gt=last_pk)
+                     .order_by('pk')
+                     .values_list('pk', 'payload')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        with transaction.atomic():
+            # строка из payment.json() уже JSON — не кодируем её повторно
+            PaymentPayloadArchive.objects.bulk_create([
+                PaymentPayloadArchive(
+                    transaction_id=pk,
+                    data=zlib.compress((payload if isinstance(payload, str) else json.dumps(payload)).encode('utf-8')),
+                ) for pk, payload in batch
+            ], update_conflicts=True, unique_fields=['transaction'], update_fields=['data', 'archived_at'])
+            # updated_at не трогаем (update() обходит auto_now): это возраст платежа, а не архивации
+            archived += PaymentTransaction.objects.filter(
+                pk__in=[pk for pk, _ in batch], payload_archived_at__isnull=True,
+            ).update(payload={}, payload_archived_at=timezone.now())
+    return archived
+
+
+def finalize_pending_order(order_id, skip_locked: bool = False):
+    """
+    Финализирует оплаченный заказ под блокировкой строки заказа, если он ещё PENDING.
+    skip_locked=True — не ждать, если заказ сейчас обрабатывает другой процесс (вебхук).
+    Возвращает статус заказа после попытки или None, если заказ занят/не найден.
+    """
+    from tickets.models import Order  # локальный импорт, чтобы избежать циклов
+    from tickets.services import finalize_order_payment
+
+    try:
+        with transaction.atomic():
+            locked = (Order.objects.select_for_update(skip_locked=skip_locked)
+                      .select_related('user').filter(pk=order_id).first())
+            if locked is None:
+                return None
+            if locked.status == Order.Status.PENDING:
+                finalize_order_payment(locked, locked.user)
+            return locked.status
+    except ValueError as e:
+        logger.error("Order %s finalization failed: %s", order_id, e)
+        return None
+
+
+def resolve_order_payment(order, payment_id: str = None, check_provider: bool = True) -> dict:
+    """
+    Определяет, оплачен ли заказ, с минимумом обращений к провайдеру:
+      1) заказ уже PAID — готово;
+      2) PaymentTransaction (её обновляет вебхук) — платёж с переданным payment_id
+         или последний по заказу;
+      3) только если транзакция ещё не succeeded — статус у провайдера (кэшируется).
+    Успешный платёж финализирует заказ под блокировкой строки заказа.
+    Возвращает {'paid', 'status', 'confirmation_url'}.
+    """
+    from tickets.models import Order  # локальный импорт, чтобы избежать циклов
+    from .models import PaymentTransaction
+
+    if order.status == Order.Status.PAID:
+        return {'paid': True, 'status': order.status, 'confirmation_url': None}
+
+    txs = PaymentTransaction.objects.filter(order=order).defer('payload')
+    tx = (txs.filter(payment_id=payment_id).first() if payment_id else None) or txs.order_by('-created_at').first()
+    if tx is None:
+        return {'paid': False, 'status': order.status, 'confirmation_url': None}
+
+    status = tx.status
+    if status != 'succeeded' and check_provider and order.status == Order.Status.PENDING:
+        provider_status = get_cached_payment_status(tx.payment_id)
+        if provider_status and provider_status != status:
+            PaymentTransaction.objects.filter(pk=tx.pk).update(status=provider_status)
+            status = provider_status
+
+    if status == 'succeeded':
+        order.status = finalize_pending_order(order.pk) or order.status
+        if order.status == Order.Status.PAID:
+            return {'paid': True, 'status': order.status, 'confirmation_url': None}
+
+    return {'paid': False, 'status': order.status, 'confirmation_url': get_confirmation_url(tx)}
+
+
+def apply_yk_notification(payload: dict):
+    """
+    Применяет уведомление ЮKassa: обновляет PaymentTransaction и, если платёж успешен,
+    финализирует заказ (если ещё не финализирован).
+    """
+    from tickets.models import Order  # локальный импорт, чтобы избежать циклов
+    from tickets.services import finalize_order_payment
+    from .models import PaymentTransaction
+
+    event = payload.get('event', '')
+    obj = payload.get('object', {}) or {}
+    payment_id = obj.get('id')
+    status = obj.get('status')
+    metadata = obj.get('metadata') or {}
+    order_id = metadata.get('order_id')
+
+    if not payment_id:
+        raise ValueError('No payment id')
+
+    # Заказ берём под блокировкой: параллельная финализация того же заказа будет ждать.
+    # Проверяем его наличие заранее — FK в Postgres отложенные и упали бы только на COMMIT.
+    order = (Order.objects.select_for_update().select_related('user')
+             .filter(id=order_id).first()) if order_id else None
+    if order is None:
+        raise ValueError(f'Unknown order {order_id!r} for payment {payment_id}')
+
+    # Лог/идемпотентность. Ссылку на оплату перезаписываем, только если она есть в уведомлении
+    defaults = {
+        "order": order,
+        "status": status or '',
+        "event": event or '',
+        "amount": Decimal(obj.get('amount', {}).get('value') or '0'),
+        "payload": payload,
+        "payload_archived_at": None,
+    }
+    confirmation_url = (obj.get('confirmation') or {}).get('confirmation_url')
+    if confirmation_url:
+        defaults["confirmation_url"] = confirmation_url
+    PaymentTransaction.objects.update_or_create(payment_id=payment_id, defaults=defaults)
+
+    # Если платёж успешен — финализируем заказ (если ещё не финализирован)
+    if status == 'succeeded' and order.status == Order.Status.CANCELED:
+        # деньги списаны, а заказ уже отменён: билеты не выпускаем, нужен возврат вручную
+        logger.error("Payment %s succeeded for canceled order %s: refund required", payment_id, order.pk)
+    elif status == 'succeeded' and order.status != Order.Status.PAID:
+        finalize_order_payment(order, order.user)
+
+
+def process_webhook_inbox(batch_size: int = 100) -> int:
+    """
+    Обрабатывает до batch_size необработанных уведомлений из WebhookInbox.
+    Записи берутся через SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько воркеров
+    не обработают одно уведомление дважды. Возвращает число обработанных записей.
+    """
+    from .models import WebhookInbox
+
+    processed = 0
+    seen = []
+    while processed < batch_size:
+        with transaction.atomic():
+            entry = (WebhookInbox.objects
+                     .select_for_update(skip_locked=True)
+                     .filter(status=WebhookInbox.Status.NEW)
+                     .exclude(pk__in=seen)
+                     .order_by('received_at')
+                     .first())
+            if entry is None:
+                break
+            seen.append(entry.pk)
+            entry.attempts += 1
+            try:
+                with transaction.atomic():
+                    apply_yk_notification(entry.payload)
+            except Exception as e:
+                logger.exception("Webhook %s (%s) failed, attempt %s", entry.payment_id, entry.event, entry.attempts)
+                entry.last_error = str(e)
+                if entry.attempts >= settings.YOO_KASSA_WEBHOOK_MAX_ATTEMPTS:
+                    entry.status = WebhookInbox.Status.FAILED
+                entry.save(update_fields=['attempts', 'last_error', 'status'])
+            else:
+                entry.status = WebhookInbox.Status.DONE
+                entry.processed_at = timezone.now()
+                entry.save(update_fields=['attempts', 'status', 'processed_at'])
+        processed += 1
+    return processed
@@ -11,41 +11,59 @@ from django.shortcuts import redirect
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 
-from tickets.services import create_order_from_cart, finalize_order_payment
-from tickets.models import Order
-from .models import PaymentTransaction
-from .services import create_yk_payment, get_yk_payment
+from core.ratelimit import limited_redirect, rate_limit
+from tickets.services import create_order_from_cart
+from .models import PaymentTransaction, WebhookInbox
+from .services import create_yk_payment, get_confirmation_url
 
 
 @login_required
+@rate_limit('payment_start', on_limit=limited_redirect('cart:checkout'))
 def yk_start(request):
     """
     Создаёт Order из корзины и стартует оплату в ЮKassa.
-    Для демо можно вызывать GET — но в продакшене лучше POST (чтобы избежать дублей).
+    Идемпотентно: повтор для той же корзины (двойной клик, обновление) возвращает
+    существующий неоплаченный заказ и его платёж, а не создаёт новые.
     """
-    # 1) Создаём заказ из корзины
+    # 1) Создаём заказ из корзины (или получаем уже созданный для этой корзины)
     order = create_order_from_cart(request.user)
     if order.total_price <= 0:
         # Заказ пустой/нулевой — отправим на success сразу
         return redirect('cart:checkout_success')
 
-    # 2) Создаём платёж в ЮKassa
-    payment = create_yk_payment(order, return_url=settings.YOO_KASSA_RETURN_URL)
+    request.session['yk_order_id'] = order.id
 
-    # 3) Сохраним в лог (и для демонстрации — в сессию)
+    # 2) Если у заказа уже есть ожидающий платёж — отправляем на его страницу оплаты
+    pending_tx = (PaymentTransaction.objects
+                  .filter(order=order, status='pending')
+                  .defer('payload')
+                  .order_by('-created_at')
+                  .first())
+    confirmation_url = get_confirmation_url(pending_tx) if pending_tx else None
+    if confirmation_url:
+        request.session['yk_payment_id'] = pending_tx.payment_id
+        return HttpResponseRedirect(confirmation_url)
+
+    # 3) Создаём платёж в ЮKassa. Ключ идемпотентности детерминирован (заказ + номер попытки),
+    # поэтому параллельные запросы получат от провайдера один и тот же платёж
+    attempt = PaymentTransaction.objects.filter(order=order).count()
+    payment = create_yk_payment(order, return_url=settings.YOO_KASSA_RETURN_URL,
+                                idempotence_key=f"order-{order.id}-{order.cart_hash[:12]}-{attempt}")
+
+    # 4) Сохраним в лог (и для демонстрации — в сессию)
     PaymentTransaction.objects.update_or_create(
         payment_id=payment.id,
         defaults={
             "order": order,
             "status": payment.status,
             "amount": Decimal(payment.amount.value or '0'),
+            "confirmation_url": payment.confirmation.confirmation_url or '',
             "payload": payment.json(),
         }
     )
     request.session['yk_payment_id'] = payment.id
-    request.session['yk_order_id'] = order.id
 
-    # 4) Редиректим пользователя на страницу оплаты ЮKassa
+    # 5) Редиректим пользователя на страницу оплаты ЮKassa
     return HttpResponseRedirect(payment.confirmation.confirmation_url)
 
 
@@ -53,6 +71,7 @@ def yk_start(request):
 def yk_webhook(request):
     """
     Вебхук от ЮKassa для уведомления о смене статуса платежа.
+    Проверяет подпись, кладёт payload в WebhookInbox и отвечает 200 без обработки.
     """
     if request.method != 'POST':
         return HttpResponseBadRequest('POST only')
@@ -71,35 +90,15 @@ def yk_webhook(request):
     except Exception:
         return HttpResponseBadRequest('Bad JSON')
 
-    event = payload.get('event', '')
     obj = payload.get('object', {}) or {}
     payment_id = obj.get('id')
-    status = obj.get('status')
-    metadata = obj.get('metadata') or {}
-    order_id = metadata.get('order_id')
-
     if not payment_id:
         return HttpResponseBadRequest('No payment id')
 
-    # Лог/идемпотентность
-    pt, _ = PaymentTransaction.objects.update_or_create(
-        payment_id=payment_id,
-        defaults={
-            "order_id": order_id or None,
-            "status": status or '',
-            "event": event or '',
-            "amount": Decimal(obj.get('amount', {}).get('value') or '0'),
-            "payload": payload,
-        }
-    )
-
-    # Если платёж успешен — финализируем заказ (если ещё не финализирован)
-    if status == 'succeeded' and order_id:
-        try:
-            order = Order.objects.select_related('user').get(id=order_id)
-            if order.status != Order.Status.PAID:
-                finalize_order_payment(order, order.user)
-        except Order.DoesNotExist:
-            pass
+    # Только сохраняем уведомление и сразу отвечаем — обработка в воркере (process_webhook_inbox).
+    # Повтор того же (payment_id, event) отбрасывается уникальным ограничением.
+    WebhookInbox.objects.bulk_create([
+        WebhookInbox(payment_id=payment_id, event=payload.get('event', '') or '', payload=payload)
+    ], ignore_conflicts=True)
 
-    return HttpResponse('OK')
\ No newline at end of file
+    return HttpResponse('OK')
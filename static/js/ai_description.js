@@ -32,6 +32,46 @@
     return await resp.json();
   }
 
+  // Потоковый вариант: SSE по fetch (EventSource не умеет POST). onDelta получает накопленный текст.
+  async function streamAI(payload, onDelta) {
+    const csrftoken = getCookie('csrftoken');
+    const resp = await fetch("/events/ai/generate-description/stream/", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        "X-CSRFToken": csrftoken || ""
+      },
+      body: JSON.stringify(payload),
+    });
+    if (!(resp.headers.get("Content-Type") || "").startsWith("text/event-stream")) {
+      return await resp.json();  // ошибка валидации/прав — обычный JSON
+    }
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = "", text = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, { stream: true });
+      let idx;
+      while ((idx = buf.indexOf("\n\n")) >= 0) {
+        const raw = buf.slice(0, idx);
+        buf = buf.slice(idx + 2);
+        let event = "message", data = "";
+        for (const line of raw.split("\n")) {
+          if (line.startsWith("event: ")) event = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        }
+        const msg = data ? JSON.parse(data) : {};
+        if (event === "error") return { error: msg.error, text: text };
+        if (event === "done") return { text: text };
+        text += msg.text || "";
+        onDelta(text);
+      }
+    }
+    return { text: text };
+  }
+
   function promptKeywords() {
     const kw = window.prompt("Уточните ключевые слова/идею (опционально):", "");
     return kw === null ? null : kw.trim();
@@ -83,24 +123,28 @@
         keywords: keywords || ""
       };
 
-      const data = await callAI(payload);
+      // куда писать решаем заранее: при потоковой генерации текст появляется по мере ответа
+      const original = descrEl.value;
+      const replace = !original || confirmInsertMode();
+      const prefix = replace ? "" : original + "\n\n";
+      const render = (t) => { descrEl.value = prefix + t; };
+
+      const data = (window.ReadableStream && window.TextDecoder)
+        ? await streamAI(payload, render)
+        : await callAI(payload);
       if (data.error) {
+        descrEl.value = original;
         showToast("Ошибка ИИ: " + data.error, "err");
         return;
       }
       const text = (data.text || "").trim();
       if (!text) {
+        descrEl.value = original;
         showToast("Пустой ответ от ИИ", "err");
         return;
       }
 
-      const replace = confirmInsertMode();
-      if (replace) {
-        descrEl.value = text;
-      } else {
-        const sep = descrEl.value ? "\n\n" : "";
-        descrEl.value = descrEl.value + sep + text;
-      }
+      render(text);
       descrEl.dispatchEvent(new Event('input', { bubbles: true }));
       showToast("Описание вставлено", "ok");
     } catch (e) {
@@ -19,7 +19,11 @@ const MiniCharts = (() => {
     const canvas = document.getElementById(id);
     if (!canvas) return {};
     const ctx = canvas.getContext('2d');
-    dpr(ctx, canvas);
+    // масштабируем один раз: график может перерисовываться (смена периода)
+    if (!canvas.dataset.dpr) {
+      dpr(ctx, canvas);
+      canvas.dataset.dpr = "1";
+    }
     return { ctx, canvas };
   }
 
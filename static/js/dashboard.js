@@ -0,0 +1,73 @@
+// static/js/dashboard.js
+// Догружает графики и таблицы дашборда параллельно после отрисовки страницы.
+(function () {
+  const EMPTY_ROW = (cols) => `<tr><td colspan="${cols}" style="padding:8px;color:#777;">Нет данных</td></tr>`;
+  const ERROR_ROW = (cols) => `<tr><td colspan="${cols}" style="padding:8px;color:#e74c3c;">Не удалось загрузить данные</td></tr>`;
+
+  function esc(value) {
+    const d = document.createElement("div");
+    d.textContent = value == null ? "" : String(value);
+    return d.innerHTML;
+  }
+
+  async function getJSON(url) {
+    const resp = await fetch(url, { credentials: "same-origin", headers: { "Accept": "application/json" } });
+    const data = await resp.json();
+    if (!resp.ok) throw new Error(data.error || resp.status);
+    return data;
+  }
+
+  function loadTimeseries(root, form) {
+    const params = new URLSearchParams();
+    for (const [k, v] of new FormData(form)) if (v) params.set(k, v);
+    const hourly = params.get("granularity") === "hour";
+
+    return getJSON(root.dataset.timeseriesUrl + "?" + params.toString()).then((ts) => {
+      MiniCharts.renderLine("chart-revenue", ts.labels, ts.revenue, { units: "₽" });
+      MiniCharts.renderLine("chart-sold", ts.labels, ts.sold, { units: "шт" });
+      document.getElementById("ts-revenue-caption").textContent = hourly ? "Выручка по часам, ₽" : "Дневная выручка, ₽";
+      document.getElementById("ts-sold-caption").textContent = hourly ? "Количество билетов в час" : "Количество билетов в день";
+    }).catch((e) => window.alert("График: " + e.message));
+  }
+
+  function loadCategories(root) {
+    return getJSON(root.dataset.categoriesUrl).then((cats) => {
+      MiniCharts.renderHBar("chart-cats", cats.labels, cats.values, { units: "₽" });
+    });
+  }
+
+  function fillTable(bodyId, cols, url, rowHtml) {
+    const body = document.getElementById(bodyId);
+    return getJSON(url)
+      .then((rows) => { body.innerHTML = rows.length ? rows.map(rowHtml).join("") : EMPTY_ROW(cols); })
+      .catch(() => { body.innerHTML = ERROR_ROW(cols); });
+  }
+
+  function cell(html) {
+    return `<td style="padding:8px;">${html}</td>`;
+  }
+
+  window.addEventListener("DOMContentLoaded", () => {
+    const root = document.getElementById("dashboard");
+    const form = document.getElementById("ts-controls");
+    if (!root || !form) return;
+
+    form.addEventListener("submit", (e) => {
+      e.preventDefault();
+      loadTimeseries(root, form);
+    });
+
+    // все запросы уходят одновременно
+    loadTimeseries(root, form);
+    loadCategories(root);
+    fillTable("top-events-body", 3, root.dataset.topEventsUrl, (r) =>
+      `<tr style="border-bottom:1px solid #f5f5f5;">` +
+      cell(`<a href="${esc(r.url)}">${esc(r.title)}</a>`) + cell(esc(r.sold)) + cell(esc(r.revenue) + " ₽") +
+      `</tr>`);
+    fillTable("events-summary-body", 6, root.dataset.eventsSummaryUrl, (r) =>
+      `<tr style="border-bottom:1px solid #f5f5f5;">` +
+      cell(`<a href="${esc(r.url)}">${esc(r.title)}</a>`) + cell(esc(r.category)) + cell(esc(r.starts_at)) +
+      cell(esc(r.location)) + cell(esc(r.sold)) + cell(esc(r.remaining)) +
+      `</tr>`);
+  });
+})();
@@ -1,20 +1,56 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from core.admin import LargeTableAdminMixin
+from events.models import Event
+from events.services.export import search_tickets
 from .models import Order, OrderItem, Ticket
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ('unit_price',)
+    raw_id_fields = ('event', 'event_tariff')
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'status', 'total_price', 'created_at', 'paid_at')
     list_filter = ('status', 'created_at', 'paid_at')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email')
+    search_help_text = "Номер заказа, логин или email покупателя"
+    raw_id_fields = ('user',)
     inlines = [OrderItemInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        # покупатели — подзапросом к users (trigram-индексы), номер заказа — по первичному ключу;
+        # стандартный поиск делал бы OR по JOIN и читал всю таблицу заказов
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        buyers = get_user_model().objects.filter(
+            Q(username__icontains=term) | Q(email__icontains=term)
+        ).values('id')
+        cond = Q(user_id__in=buyers)
+        if term.isascii() and term.isdigit():
+            cond |= Q(pk=int(term))
+        return queryset.filter(cond), False
+
 @admin.register(Ticket)
-class TicketAdmin(admin.ModelAdmin):
+class TicketAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'event', 'event_tariff', 'is_used', 'created_at')
     list_filter = ('is_used', 'event')
+    # event_tariff.__str__ читает событие и тариф — всё одним JOIN
+    list_select_related = ('user', 'event', 'event_tariff__event', 'event_tariff__tariff')
     search_fields = ('qr_hash', 'user__username', 'user__email', 'event__title')
+    search_help_text = "Часть QR-хэша, имя, логин или email покупателя, название события"
+    raw_id_fields = ('order', 'user', 'event', 'event_tariff')
+
+    def get_search_results(self, request, queryset, search_term):
+        # тот же поиск, что в выгрузке организатора (подзапрос к users + хэш),
+        # плюс события по названию — каждое условие идёт по своему индексу
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        events = Event.objects.filter(title__icontains=term).values('id')
+        return search_tickets(queryset, term) | queryset.filter(event_id__in=events), False
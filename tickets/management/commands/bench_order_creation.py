@@ -0,0 +1,70 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cart.models import CartItem
+from events.models import Category, Event, EventTariff, Tariff
+from tickets.models import Order
+from tickets.services import create_order_from_cart
+
+
+class Command(BaseCommand):
+    help = (
+        "Микро-бенчмарк create_order_from_cart для корзин из 1, 10 и 50 позиций: "
+        "время и число SQL-запросов. Данные создаются в транзакции и откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', nargs='+', type=int, default=[1, 10, 50])
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов на размер корзины')
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            user, tariffs = self._fixtures(max(opts['lines']))
+            self.stdout.write(f"{'lines':>6} {'queries':>8} {'median ms':>10} {'p95 ms':>8}")
+            for lines in opts['lines']:
+                self._bench(user, tariffs[:lines], opts['repeat'])
+            transaction.set_rollback(True)
+
+    def _fixtures(self, max_lines):
+        User = get_user_model()
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        organizer = User.objects.create(username=f'bench-org-{suffix}', email=f'org-{suffix}@bench.local',
+                                        is_organizer=True)
+        buyer = User.objects.create(username=f'bench-buyer-{suffix}', email=f'buyer-{suffix}@bench.local')
+        category, _ = Category.objects.get_or_create(name='Бенчмарк', defaults={'slug': f'bench-{suffix}'})
+        event = Event.objects.create(title=f'Бенчмарк заказа {suffix}', category=category, organizer=organizer,
+                                     starts_at=timezone.now() + timedelta(days=30), location='—',
+                                     status=Event.Status.PUBLISHED, available_tickets=10 ** 6)
+        tariffs = []
+        for i in range(max_lines):
+            tariff, _ = Tariff.objects.get_or_create(name=f'Бенчмарк {i + 1}')
+            tariffs.append(EventTariff.objects.create(event=event, tariff=tariff, price=Decimal('500.00'),
+                                                      available_quantity=10 ** 6))
+        return buyer, tariffs
+
+    def _bench(self, user, tariffs, repeat):
+        CartItem.objects.filter(user=user).delete()
+        CartItem.objects.bulk_create([
+            CartItem(user=user, event_id=et.event_id, event_tariff=et, quantity=2) for et in tariffs
+        ])
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            # закрываем предыдущий заказ, иначе сработает идемпотентность и вернётся он же
+            Order.objects.filter(user=user, status=Order.Status.PENDING).update(status=Order.Status.CANCELED)
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                create_order_from_cart(user)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(ctx.captured_queries)
+        timings.sort()
+        p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+        self.stdout.write(f"{len(tariffs):>6} {queries:>8} {statistics.median(timings):>10.2f} {p95:>8.2f}")
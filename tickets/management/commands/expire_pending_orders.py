@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tickets.services import expire_pending_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Отменяет неоплаченные заказы старше ORDER_PENDING_TTL_MINUTES (или --older-than) "
+        "пачками и удаляет их позиции."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=None, help='Возраст заказа, мин')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Запускать по расписанию')
+        parser.add_argument('--interval', type=int, default=600, help='Пауза между проходами, сек')
+
+    def handle(self, *args, **opts):
+        minutes = opts['older_than'] if opts['older_than'] is not None else settings.ORDER_PENDING_TTL_MINUTES
+        while True:
+            started = time.perf_counter()
+            stats = expire_pending_orders(timezone.now() - timedelta(minutes=minutes), batch_size=opts['batch_size'])
+            self.stdout.write(
+                f"Отменено заказов: {stats['canceled']}, удалено позиций: {stats['items_deleted']}, "
+                f"пачек: {stats['batches']} за {time.perf_counter() - started:.1f} с"
+            )
+            if not opts['loop']:
+                break
+            time.sleep(opts['interval'])
@@ -1,6 +1,8 @@
 # tickets/models.py
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 from decimal import Decimal
 import uuid
@@ -19,11 +21,29 @@ class Order(models.Model):
     payment_provider = models.CharField(max_length=50, blank=True)
     payment_id = models.CharField(max_length=100, blank=True)
     receipt_url = models.URLField(blank=True)
+    # хэш (пользователь, содержимое корзины): повторное оформление той же корзины
+    # возвращает существующий неоплаченный заказ вместо нового
+    cart_hash = models.CharField(max_length=64, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     paid_at = models.DateTimeField(null=True, blank=True)
     canceled_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # частичный индекс: свипер просроченных заказов читает только PENDING
+            models.Index(fields=['created_at'], name='order_pending_created_idx',
+                         condition=models.Q(status='pending')),
+        ]
+        constraints = [
+            # не более одного ожидающего оплаты заказа на одну и ту же корзину
+            models.UniqueConstraint(
+                fields=['user', 'cart_hash'],
+                condition=models.Q(status='pending') & ~models.Q(cart_hash=''),
+                name='uniq_pending_order_per_cart',
+            ),
+        ]
+
     def __str__(self):
         return f'Order #{self.pk} ({self.get_status_display()})'
 
@@ -49,6 +69,15 @@ class Ticket(models.Model):
     is_used = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # список билетов события (сортировка по дате покупки) и фильтр по статусу
+            models.Index(fields=['event', 'created_at'], name='ticket_event_created_idx'),
+            models.Index(fields=['event', 'is_used'], name='ticket_event_used_idx'),
+            # поиск по части QR-хэша через pg_trgm (icontains -> UPPER(qr_hash) LIKE)
+            GinIndex(OpClass(Upper('qr_hash'), name='gin_trgm_ops'), name='ticket_qr_hash_trgm_idx'),
+        ]
+
     def __str__(self):
         return f'Ticket #{self.pk} for {self.event.title}'
 
@@ -1,9 +1,12 @@
 # tickets/services.py
+import hashlib
 from decimal import Decimal
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
 from events.models import EventTariff
 from cart.models import CartItem
+from cart.services import invalidate_cart_summary
 from .models import Order, OrderItem, Ticket
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
@@ -62,7 +65,18 @@ def send_tickets_email(order_id: int, attach_pdfs: bool = True) -> None:
         logger.exception("Tickets email FAILED: order=%s to=%s: %s",
                          order.id, order.user.email, e)
 
+def cart_hash(user, items) -> str:
+    """Хэш (пользователь, позиции корзины с количеством и ценой) — ключ идемпотентности заказа."""
+    lines = sorted((ci.event_tariff_id, ci.quantity, str(ci.event_tariff.price)) for ci in items)
+    raw = f"{user.pk}:" + ";".join(f"{et}x{qty}@{price}" for et, qty, price in lines)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
 def create_order_from_cart(user):
+    """
+    Создаёт заказ из корзины. Идемпотентно: если для той же корзины уже есть
+    неоплаченный заказ (двойной клик, обновление страницы), возвращается он.
+    """
     items = list(CartItem.objects.select_related('event', 'event_tariff').filter(user=user))
     if not items:
         raise ValueError("Корзина пуста.")
@@ -72,25 +86,75 @@ def create_order_from_cart(user):
         if not ci.event.is_buyable:
             raise ValueError(f"Нельзя оформить заказ: событие «{ci.event.title}» недоступно для покупки.")
 
-    order = Order.objects.create(user=user, total_price=Decimal('0.00'), status=Order.Status.PENDING)
+    key = cart_hash(user, items)
+    existing = Order.objects.filter(user=user, cart_hash=key, status=Order.Status.PENDING).first()
+    if existing:
+        return existing
 
+    # Позиции и итог считаем за один проход, заказ вставляем сразу с итоговой суммой
     total = Decimal('0.00')
+    order_items = []
     for ci in items:
         price = ci.event_tariff.price
-        OrderItem.objects.create(
-            order=order,
-            event=ci.event,
-            event_tariff=ci.event_tariff,
+        order_items.append(OrderItem(
+            event_id=ci.event_id,
+            event_tariff_id=ci.event_tariff_id,
             quantity=ci.quantity,
             unit_price=price
-        )
+        ))
         total += price * ci.quantity
 
-    order.total_price = total
-    order.save(update_fields=['total_price'])
+    try:
+        # заказ с позициями в одной транзакции (INSERT заказа + один bulk INSERT позиций):
+        # параллельный запрос с той же корзиной ждёт на уникальном индексе и получает полный заказ
+        with transaction.atomic():
+            order = Order.objects.create(user=user, total_price=total,
+                                         status=Order.Status.PENDING, cart_hash=key)
+            for oi in order_items:
+                oi.order = order
+            OrderItem.objects.bulk_create(order_items)
+    except IntegrityError:
+        # параллельный запрос уже создал заказ для этой корзины
+        return Order.objects.get(user=user, cart_hash=key, status=Order.Status.PENDING)
     return order
 
 
+def expire_pending_orders(older_than, batch_size: int = 1000) -> dict:
+    """
+    Отменяет неоплаченные заказы, созданные раньше older_than, пачками по batch_size:
+    один UPDATE заказов и один DELETE их позиций на пачку (выборка идёт по частичному индексу).
+    Заказы, платёж по которым ещё может пройти или уже прошёл, не трогаем — их решает reconcile_payments
+    по статусу у провайдера: платёж pending/waiting_for_capture/succeeded или необработанное
+    уведомление о нём в WebhookInbox.
+    """
+    from payments.models import PaymentTransaction, WebhookInbox  # локальный импорт, чтобы избежать циклов
+
+    unprocessed = WebhookInbox.objects.exclude(status=WebhookInbox.Status.DONE).values('payment_id')
+    open_payments = PaymentTransaction.objects.filter(order=OuterRef('pk')).filter(
+        Q(status__in=('pending', 'waiting_for_capture', 'succeeded')) | Q(payment_id__in=unprocessed)
+    )
+    stats = {'canceled': 0, 'items_deleted': 0, 'batches': 0}
+    while True:
+        with transaction.atomic():
+            # заказы пачки блокируем: оплата/отмена параллельно не пройдёт, и позиции удаляем
+            # только у отменённых здесь заказов
+            ids = list(Order.objects
+                       .select_for_update(skip_locked=True)
+                       .filter(status=Order.Status.PENDING, created_at__lt=older_than)
+                       .exclude(Exists(open_payments))
+                       .order_by('created_at')
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            stats['canceled'] += Order.objects.filter(id__in=ids).update(
+                status=Order.Status.CANCELED, canceled_at=timezone.now()
+            )
+            deleted, _ = OrderItem.objects.filter(order_id__in=ids).delete()
+            stats['items_deleted'] += deleted
+            stats['batches'] += 1
+    return stats
+
+
 @transaction.atomic
 def finalize_order_payment(order: Order, user):
     if order.user_id != user.id:
@@ -125,6 +189,7 @@ def finalize_order_payment(order: Order, user):
     order.save(update_fields=['status', 'paid_at'])
 
     CartItem.objects.filter(user=order.user).delete()
+    transaction.on_commit(lambda: invalidate_cart_summary(order.user_id))
     transaction.on_commit(lambda: send_tickets_email(order.id, attach_pdfs=True))
     return order
 
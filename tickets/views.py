@@ -6,6 +6,7 @@ from .utils import build_ticket_pdf
 import re
 from django.contrib import messages
 from events.models import Event
+from core.ratelimit import limited_redirect, rate_limit
 
 @login_required
 def my_tickets(request):
@@ -104,6 +105,7 @@ def _locate_ticket(data: dict):
 
 
 @login_required
+@rate_limit('ticket_scan', on_limit=limited_redirect(), methods=('POST',))
 def scan_ticket(request, event_id=None):
     # доступ только организатору/админу
     if not _require_organizer_or_admin(request):
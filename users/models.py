@@ -1,15 +1,30 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
 from django.conf import settings
 from django.db.models import Q, UniqueConstraint
+from django.db.models.functions import Upper
 
 
 class User(AbstractUser):
     email = models.EmailField("Email", unique=True)
     phone = models.CharField("Телефон", max_length=20, blank=True)
     avatar = models.ImageField("Аватар", upload_to="avatars/", blank=True, null=True)
+    # размеры аватара; заполняются после создания производных (core.images)
+    avatar_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    avatar_height = models.PositiveIntegerField(blank=True, null=True, editable=False)
     is_organizer = models.BooleanField("Организатор", default=False)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # поиск покупателя по части имени/email через pg_trgm; icontains в PostgreSQL —
+            # UPPER(col::text) LIKE UPPER(%s), поэтому индекс строится по UPPER(col)
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='user_email_trgm_idx'),
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='user_username_trgm_idx'),
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='user_first_name_trgm_idx'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='user_last_name_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.username
 